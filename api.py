@@ -0,0 +1,233 @@
+"""Local JSON API over the rules core, for chat bots and virtual tabletops.
+
+    python api.py --port 8765 [--store characters.db]
+
+Routes (all JSON):
+    GET    /health
+    GET    /characters                  stored characters (id, name, version)
+    GET    /characters/<id>             the stored {"builder", "freebies"} document
+    GET    /characters/<id>/sheet       totals + derived stats (LRU cached)
+    PUT    /characters/<id>             store a document, invalidates the cache
+    DELETE /characters/<id>
+    POST   /sheet                       totals for a posted document, nothing stored
+    POST   /check                       rules the posted document breaks in its edition
+    GET    /editions                    rule sets available (budgets, caps, costs)
+    GET    /merits                      Merits & Flaws catalog (points, requires, excludes)
+    GET    /generation/<gen>            trait max, blood pool, blood per turn
+    GET    /roll?pool=5&diff=6          d10 pool
+
+Sheets are cached as encoded response bodies, so a hit costs one dict lookup.
+Writes through this API invalidate their entry. Writes made by other
+processes (the Streamlit app) show up in SQLite's data_version; entries cached
+before one are rechecked against their row's (version, updated) stamp on the
+next hit and rebuilt only if the character itself changed.
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import merits
+from rules import EDITIONS, GENERATION_TABLE, check_character, edition_of, gen_info, roll_d10, sheet_totals
+from store import DEFAULT_PATH, CharacterStore
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+MAX_BODY = 1 << 20
+GENERATIONS = {g["gen"] for g in GENERATION_TABLE}
+
+class LRU:
+    def __init__(self, capacity:int=1024):
+        self.capacity = capacity
+        self.data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key:str) -> Optional[tuple]:
+        val = self.data.get(key)
+        if val is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def put(self, key:str, val:tuple):
+        self.data[key] = val
+        self.data.move_to_end(key)
+        if len(self.data) > self.capacity:
+            self.data.popitem(last=False)
+
+    def invalidate(self, key:str):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+def encode(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def error(status:int, msg:str) -> Tuple[int, bytes]:
+    return status, encode({"error": msg})
+
+class Api:
+    def __init__(self, store:CharacterStore, cache_size:int=1024, seed:Optional[int]=None):
+        self.store = store
+        self.cache = LRU(cache_size)  # id -> (epoch, row stamp, encoded sheet)
+        self.epoch = 0  # bumped whenever another process wrote to the database
+        self.rng = random.Random(seed)
+
+    # ---- routing ----
+
+    def route(self, method:str, target:str, body:bytes) -> Tuple[int, bytes]:
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        try:
+            if parts == ["health"]:
+                return 200, encode({"ok": True, "cached": len(self.cache.data), "hits": self.cache.hits, "misses": self.cache.misses})
+            if parts and parts[0] == "characters":
+                return self.characters(method, parts[1:], body)
+            if parts == ["sheet"] and method == "POST":
+                data = json.loads(body or b"{}")
+                return 200, encode(sheet_totals(data["builder"], data["freebies"]))
+            if parts == ["check"] and method == "POST":
+                data = json.loads(body or b"{}")
+                problems = check_character(data["builder"], data["freebies"])
+                return 200, encode({"edition": edition_of(data["builder"]).key, "ok": not problems, "problems": problems})
+            if parts == ["editions"] and method == "GET":
+                return 200, encode({k: {"name": e.name, "description": e.description, "freebies": e.freebies,
+                                        "budgets": e.budgets, "maxima": e.maxima, "costs": e.costs} for k, e in EDITIONS.items()})
+            if parts == ["merits"] and method == "GET":
+                return 200, encode(merits.ENTRIES)
+            if len(parts) == 2 and parts[0] == "generation" and method == "GET":
+                gen = int(parts[1])
+                if gen not in GENERATIONS:  # gen_info would quietly answer for the 13th
+                    return error(404, f"no generation {gen} (known: {min(GENERATIONS)}-{max(GENERATIONS)})")
+                return 200, encode(gen_info(gen))
+            if parts == ["roll"] and method == "GET":
+                q = parse_qs(url.query)
+                pool = int(q.get("pool", ["5"])[0]); diff = int(q.get("diff", ["6"])[0])
+                if not (1 <= pool <= 30 and 2 <= diff <= 10):
+                    return error(400, "pool must be 1-30 and diff 2-10")
+                return 200, encode(roll_d10(pool, diff, self.rng))
+        except (ValueError, KeyError, TypeError) as e:
+            return error(400, f"bad request: {e}")
+        return error(404, "no such route")
+
+    def characters(self, method:str, parts:list, body:bytes) -> Tuple[int, bytes]:
+        if not parts:
+            if method != "GET": return error(405, "method not allowed")
+            return 200, encode(self.store.list())
+        char_id = parts[0]
+        if len(parts) == 2 and parts[1] == "sheet" and method == "GET":
+            return self.sheet(char_id)
+        if len(parts) != 1:
+            return error(404, "no such route")
+        if method == "GET":
+            raw = self.store.get_raw(char_id)
+            return (200, raw.encode("utf-8")) if raw is not None else error(404, "unknown character")
+        if method == "PUT":
+            data = json.loads(body or b"{}")
+            if "builder" not in data or "freebies" not in data:
+                return error(400, "document needs 'builder' and 'freebies'")
+            sheet_totals(data["builder"], data["freebies"])  # reject documents the rules can't read
+            version = self.store.put(char_id, data)
+            self.cache.invalidate(char_id)
+            return 201, encode({"id": char_id, "version": version})
+        if method == "DELETE":
+            self.cache.invalidate(char_id)
+            return (200, encode({"deleted": char_id})) if self.store.delete(char_id) else error(404, "unknown character")
+        return error(405, "method not allowed")
+
+    def sheet(self, char_id:str) -> Tuple[int, bytes]:
+        # Sessions, the play log and the review queue share the database, so a
+        # foreign write says little about this character: entries cached before
+        # it are kept while their row's stamp still matches.
+        if self.store.changed_elsewhere():
+            self.epoch += 1
+        hit = self.cache.get(char_id)
+        if hit is not None:
+            epoch, stamp, out = hit
+            if epoch == self.epoch:
+                return 200, out
+            if self.store.stamp(char_id) == stamp:
+                self.cache.put(char_id, (self.epoch, stamp, out))
+                return 200, out
+        got = self.store.get_stamped(char_id)
+        if got is None:
+            self.cache.invalidate(char_id)
+            return error(404, "unknown character")
+        data, stamp = got
+        out = encode(sheet_totals(data["builder"], data["freebies"]))
+        self.cache.put(char_id, (self.epoch, stamp, out))
+        return 200, out
+
+    # ---- HTTP/1.1 (keep-alive, Content-Length bodies only) ----
+
+    async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:  # the body can't be framed: answer and hang up
+                    status, out = error(400, "body too large" if length > MAX_BODY else "bad Content-Length")
+                    body = b""
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, out = self.route(method, target, body)
+                    except Exception as e:  # keep serving other requests
+                        status, out = error(500, str(e))
+                keep = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1" and 0 <= length <= MAX_BODY
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n%s\r\n"
+                    % (status, REASONS[status].encode(), len(out), b"" if keep else b"Connection: close\r\n")
+                    + out
+                )
+                await writer.drain()
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host:str, port:int, store_path:str, cache_size:int):
+    api = Api(CharacterStore(store_path), cache_size)
+    server = await asyncio.start_server(api.handle, host, port, reuse_address=True)
+    print(f"V20 API on http://{host}:{port} (store: {store_path})", flush=True)
+    async with server:
+        await server.serve_forever()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--store", default=DEFAULT_PATH)
+    ap.add_argument("--cache", type=int, default=1024, help="sheets kept in the LRU")
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.store, args.cache))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
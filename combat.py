@@ -0,0 +1,196 @@
+"""Combat and initiative tracker.
+
+Initiative is Dexterity + Wits + 1d10 (less wound penalties). Each round the
+actions go into a heap keyed by (phase, -initiative, -Dexterity, seq): every
+combatant's normal action comes first, then Celerity extra actions, which
+cost 1 Blood each and are limited by Celerity dots and Blood per Turn.
+NPC attacks are resolved in one batch per round with the shared dice rules
+(1s cancel successes on the attack roll only, not on damage or soak).
+
+    python combat.py --bench 100     # time full rounds for 100 combatants
+"""
+import argparse
+import heapq
+import random
+import time
+from typing import Dict, List, Optional
+
+from rules import gen_info, roll_d10, sheet_totals
+
+HEALTH_LEVELS = ["Bruised","Hurt","Injured","Wounded","Mauled","Crippled","Incapacitated"]
+WOUND_PENALTY = [0, 0, -1, -1, -2, -2, -5, -5]  # indexed by damage taken; 7 = incapacitated
+DIFFICULTY = 6
+
+def combatant_from_character(cid:str, data:dict, side:str="players", npc:bool=False) -> dict:
+    B, F = data["builder"], data["freebies"]
+    t = sheet_totals(B, F)
+    a, ab, d = t["attributes"], t["abilities"], t["disciplines"]
+    return {
+        "id": cid, "name": t["name"] or cid, "side": side, "npc": npc,
+        "dex": a["physical"]["Dexterity"], "wits": a["mental"]["Wits"],
+        "str": a["physical"]["Strength"], "sta": a["physical"]["Stamina"],
+        "brawl": ab["talents"]["Brawl"],
+        "celerity": d.get("Celerity", 0), "potence": d.get("Potence", 0), "fortitude": d.get("Fortitude", 0),
+        "blood": t["bloodPool"], "bloodPool": t["bloodPool"], "bloodPerTurn": t["bloodPerTurn"],
+        "damage": 0, "spent_this_turn": 0,
+    }
+
+def make_npc(cid:str, name:str="", side:str="npcs", dex:int=2, wits:int=2, strength:int=2, stamina:int=2,
+             brawl:int=2, celerity:int=0, potence:int=0, fortitude:int=0, generation:int=13) -> dict:
+    GI = gen_info(generation)
+    return {
+        "id": cid, "name": name or cid, "side": side, "npc": True,
+        "dex": dex, "wits": wits, "str": strength, "sta": stamina, "brawl": brawl,
+        "celerity": celerity, "potence": potence, "fortitude": fortitude,
+        "blood": GI["bloodPool"], "bloodPool": GI["bloodPool"], "bloodPerTurn": GI["bloodPerTurn"],
+        "damage": 0, "spent_this_turn": 0,
+    }
+
+class Encounter:
+    def __init__(self, seed:Optional[int]=None):
+        self.rng = random.Random(seed)
+        self.combatants: Dict[str, dict] = {}
+        self.round = 0
+        self.initiative: Dict[str, int] = {}
+        self.queue: List[tuple] = []
+        self._seq = 0
+        self.log: List[dict] = []
+
+    def add(self, c:dict):
+        self.combatants[c["id"]] = c
+
+    def remove(self, cid:str):
+        self.combatants.pop(cid, None)
+
+    def alive(self, c:dict) -> bool:
+        return c["damage"] < len(HEALTH_LEVELS)
+
+    def penalty(self, c:dict) -> int:
+        return WOUND_PENALTY[min(c["damage"], len(WOUND_PENALTY) - 1)]
+
+    def wound(self, c:dict, n:int) -> int:
+        """Add ``n`` health levels of damage (negative heals); returns the damage now taken."""
+        c["damage"] = max(0, min(len(HEALTH_LEVELS), c["damage"] + n))
+        return c["damage"]
+
+    def health_label(self, c:dict) -> str:
+        return "Healthy" if c["damage"] == 0 else HEALTH_LEVELS[min(c["damage"], len(HEALTH_LEVELS)) - 1]
+
+    # ---- blood ----
+
+    def spend_blood(self, c:dict, n:int=1) -> bool:
+        if c["blood"] < n or c["spent_this_turn"] + n > c["bloodPerTurn"]:
+            return False
+        c["blood"] -= n
+        c["spent_this_turn"] += n
+        return True
+
+    # ---- scheduling ----
+
+    def _push(self, phase:int, c:dict, action:int):
+        heapq.heappush(self.queue, (phase, -self.initiative[c["id"]], -c["dex"], self._seq, c["id"], action))
+        self._seq += 1
+
+    def start_round(self, celerity:Optional[Dict[str, int]]=None):
+        """Roll initiative and queue actions. ``celerity`` maps id -> extra actions
+        wanted; NPCs not listed use as many as their Blood allows."""
+        self.round += 1
+        self.queue = []
+        celerity = celerity or {}
+        rng = self.rng
+        for c in self.combatants.values():
+            c["spent_this_turn"] = 0
+            if not self.alive(c):
+                continue
+            self.initiative[c["id"]] = c["dex"] + c["wits"] + int(rng.random() * 10) + 1 + self.penalty(c)
+            self._push(0, c, 0)
+            wanted = celerity.get(c["id"], c["celerity"] if c["npc"] else 0)
+            for extra in range(1, min(wanted, c["celerity"]) + 1):
+                if not self.spend_blood(c):
+                    break
+                self._push(1, c, extra)
+
+    def next_action(self) -> Optional[dict]:
+        while self.queue:
+            _, _, _, _, cid, action = heapq.heappop(self.queue)
+            c = self.combatants.get(cid)
+            if c is not None and self.alive(c):
+                return {"id": cid, "action": action}
+        return None
+
+    # ---- resolution ----
+
+    def attack(self, attacker:dict, target:dict) -> dict:
+        rng = self.rng
+        hits = roll_d10(attacker["dex"] + attacker["brawl"] + self.penalty(attacker), DIFFICULTY, rng)["net"]
+        dmg = 0
+        if hits > 0:
+            # 1s only cancel successes on the attack roll, not on damage or soak
+            raw = roll_d10(attacker["str"] + attacker["potence"] + hits - 1, DIFFICULTY, rng)["successes"]
+            soak = roll_d10(target["sta"] + target["fortitude"], DIFFICULTY, rng)["successes"]
+            dmg = max(0, raw - soak)
+            self.wound(target, dmg)
+        return {"round": self.round, "attacker": attacker["id"], "target": target["id"], "hits": hits, "damage": dmg}
+
+    def player_attack(self, cid:str, target_id:str) -> dict:
+        """A player's action aimed at ``target_id``, rolled and logged like an NPC attack."""
+        result = self.attack(self.combatants[cid], self.combatants[target_id])
+        self.log.append(result)
+        return result
+
+    def pick_target(self, attacker:dict, foes:List[dict]) -> Optional[dict]:
+        # random probes first; only scan the whole list once most foes are down
+        for _ in range(4):
+            if not foes: return None
+            c = foes[int(self.rng.random() * len(foes))]
+            if self.alive(c): return c
+        foes[:] = [c for c in foes if self.alive(c)]
+        return self.rng.choice(foes) if foes else None
+
+    def resolve_npc_attacks(self, targets:Optional[Dict[str, str]]=None) -> List[dict]:
+        """Run the queued actions in order; NPCs attack (``targets`` id -> id, else a
+        random living foe). Player actions are handed back untouched for the table."""
+        targets = targets or {}
+        sides = {c["side"] for c in self.combatants.values()}
+        foes_of = {s: [c for c in self.combatants.values() if c["side"] != s and self.alive(c)] for s in sides}
+        results = []
+        while True:
+            act = self.next_action()
+            if act is None:
+                break
+            c = self.combatants[act["id"]]
+            if not c["npc"]:
+                results.append({"round": self.round, "player": c["id"], "action": act["action"]})
+                continue
+            target = self.combatants.get(targets.get(c["id"], ""))
+            if target is None or not self.alive(target):
+                target = self.pick_target(c, foes_of[c["side"]])
+            if target is not None:
+                results.append(self.attack(c, target))
+        self.log.extend(results)
+        return results
+
+    def advance_round(self, celerity:Optional[Dict[str, int]]=None, targets:Optional[Dict[str, str]]=None) -> List[dict]:
+        self.start_round(celerity)
+        return self.resolve_npc_attacks(targets)
+
+def bench(n:int, rounds:int=20):
+    enc = Encounter(seed=1)
+    rng = random.Random(2)
+    for i in range(n):
+        enc.add(make_npc(f"npc-{i}", side="a" if i % 2 else "b", dex=rng.randint(1,5), wits=rng.randint(1,5),
+                         strength=rng.randint(1,5), stamina=rng.randint(1,5), brawl=rng.randint(0,5),
+                         celerity=rng.randint(0,3), generation=rng.choice([8,9,10,11,12,13])))
+    times = []
+    for _ in range(rounds):
+        for c in enc.combatants.values(): c["damage"] = 0  # keep everyone standing
+        t0 = time.perf_counter()
+        enc.advance_round()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    print(f"{n} combatants: median {times[len(times)//2]*1000:.2f} ms/round, worst {times[-1]*1000:.2f} ms")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Combat tracker benchmark")
+    ap.add_argument("--bench", type=int, default=100, help="number of combatants")
+    bench(ap.parse_args().bench)
@@ -0,0 +1,181 @@
+"""Export artifacts (JSON, zip bundle, printable sheet) cached by content hash.
+
+The key is a blake2b digest of the session's packed state (``sessions.pack``),
+which the app already holds for every rerun, so finding out whether an
+export is still current costs one hash over a few hundred bytes. Artifacts
+are rebuilt only when the character changed, and live in one LRU per
+process bounded by entry count and total bytes.
+
+    python exports.py --bench     # build vs. cached cost per format
+"""
+import argparse
+import hashlib
+import html
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from rules import ATTR_GROUPS, check_character, edition_of, sheet_totals
+from sessions import Packed, pack
+
+MAX_BYTES = int(float(os.environ.get("V20_EXPORT_CACHE_MB", "64")) * (1 << 20))
+MAX_ITEMS = 4096
+
+# ======================
+# KEYS
+# ======================
+
+def state_key(packed:Packed) -> str:
+    raw, text, extra = packed
+    h = hashlib.blake2b(raw, digest_size=16)
+    for t in text:
+        h.update(b"\1" if t is None else t.encode("utf-8") + b"\0")
+    if extra:
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+# ======================
+# BUILDERS
+# ======================
+
+def build_json(B:dict, F:dict) -> bytes:
+    return json.dumps({"builder": B, "freebies": F}, indent=2).encode("utf-8")
+
+def _dots(n:int, cap:int) -> str:
+    return "●" * n + "○" * max(0, cap - n)
+
+def build_print(B:dict, F:dict) -> bytes:
+    """A self-contained HTML sheet that prints on one page."""
+    t, E = sheet_totals(B, F), edition_of(B)
+    caps = E.caps_for(t["traitMax"])
+    c = B["concept"]
+    esc = html.escape
+    def section(title, rows):
+        body = "".join(f"<tr><td>{esc(k)}</td><td class=d>{v}</td></tr>" for k, v in rows)
+        return f"<div class=box><h3>{esc(title)}</h3><table>{body}</table></div>"
+    blocks = [section(label, [(s, _dots(t["attributes"][g][s], caps["attribute"])) for s in stats]) for g, label, stats in ATTR_GROUPS]
+    blocks += [section(cat.capitalize(), [(n, _dots(v, caps["ability"])) for n, v in vals.items()]) for cat, vals in t["abilities"].items()]
+    blocks.append(section("Disciplines", [(d, _dots(v, caps["discipline"])) for d, v in t["disciplines"].items()]))
+    blocks.append(section("Backgrounds", [(bg, _dots(v, caps["background"])) for bg, v in t["backgrounds"].items()]))
+    blocks.append(section("Virtues", [(vt, _dots(v, caps["virtue"])) for vt, v in t["virtues"].items()]))
+    blocks.append(section("Derived", [
+        ("Humanity/Path", _dots(t["humanity"], caps["humanity"])), ("Willpower", _dots(t["willpower"], caps["willpower"])),
+        ("Blood Pool", f"{t['bloodPool']} (per turn {t['bloodPerTurn']})"), ("Trait Max", t["traitMax"]),
+    ]))
+    problems = check_character(B, F)
+    notes = "".join(f"<li>{esc(p)}</li>" for p in problems)
+    head = " · ".join(esc(str(v)) for v in (c["clan"], f"{c['generation']}th generation", c["nature"], c["demeanor"], E.name) if v)
+    doc = f"""<!doctype html><html><head><meta charset="utf-8"><title>{esc(c['name'] or 'V20 Character')}</title>
+<style>
+body {{ font-family: Georgia, serif; margin: 1.5cm; color: #111; }}
+h1 {{ margin: 0; }} h3 {{ margin: .2em 0; border-bottom: 1px solid #555; }}
+.grid {{ display: grid; grid-template-columns: repeat(3, 1fr); gap: .6em 1.2em; }}
+table {{ width: 100%; border-collapse: collapse; font-size: 10pt; }} td.d {{ text-align: right; letter-spacing: 1px; }}
+@media print {{ body {{ margin: 0; }} }}
+</style></head><body>
+<h1>{esc(c['name'] or 'Unnamed')}</h1><p>{esc(c['concept'])}<br>{head}<br>Player: {esc(c['player'] or '—')} · Chronicle: {esc(c['chronicle'] or '—')} · Sire: {esc(c['sire'] or '—')}</p>
+<div class=grid>{''.join(blocks)}</div>
+{f'<h3>Rules check</h3><ul>{notes}</ul>' if problems else ''}
+<h3>Merits &amp; Flaws</h3><p>{esc(', '.join(B.get('merits', ()))) or '—'}</p><p>{esc(B.get('meritsFlaws', ''))}</p>
+<h3>Notes</h3><p>{esc(B.get('notes', '')) or '—'}</p>
+</body></html>"""
+    return doc.encode("utf-8")
+
+def build_bundle(B:dict, F:dict, part:Optional[Callable[[str], bytes]]=None) -> bytes:
+    """Zip of the JSON document, the printable sheet and the computed totals;
+    ``part(kind)`` supplies the first two (the cache passes its own lookup)."""
+    get = part or (lambda kind: FORMATS[kind][0](B, F))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("character.json", get("json"))
+        z.writestr("sheet.html", get("print"))
+        z.writestr("totals.json", json.dumps(sheet_totals(B, F), indent=2))
+    return buf.getvalue()
+
+# kind -> (builder, mime type, file extension)
+FORMATS: Dict[str, Tuple[Callable[[dict, dict], bytes], str, str]] = {
+    "json":   (build_json,   "application/json", ".json"),
+    "print":  (build_print,  "text/html",        ".html"),
+    "bundle": (build_bundle, "application/zip",  ".zip"),
+}
+
+# ======================
+# CACHE
+# ======================
+
+class ExportCache:
+    """LRU of built artifacts keyed by (state digest, format), bounded by
+    ``max_items`` and ``max_bytes``; artifacts bigger than the whole budget
+    are built and returned but never kept."""
+
+    def __init__(self, max_bytes:int=MAX_BYTES, max_items:int=MAX_ITEMS):
+        self.max_bytes, self.max_items = max_bytes, max_items
+        self._data: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, B:dict, F:dict, kind:str, packed:Optional[Packed]=None, key:Optional[str]=None) -> bytes:
+        """The ``kind`` artifact for this state. Pass the state's ``packed`` form
+        (or its ``key``) when it is at hand; otherwise it is packed here."""
+        if key is None:
+            key = state_key(packed if packed is not None else pack(B, F))
+        k = (key, kind)
+        with self._lock:
+            hit = self._data.get(k)
+            if hit is not None:
+                self._data.move_to_end(k)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        if kind == "bundle":
+            out = build_bundle(B, F, lambda part: self.get(B, F, part, key=key))
+        else:
+            out = FORMATS[kind][0](B, F)
+        self._put(k, out)
+        return out
+
+    def _put(self, k:Tuple[str, str], out:bytes):
+        if len(out) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(k, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._data[k] = out
+            self._bytes += len(out)
+            while self._bytes > self.max_bytes or len(self._data) > self.max_items:
+                _, dropped = self._data.popitem(last=False)
+                self._bytes -= len(dropped)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._data), "bytes": self._bytes, "maxBytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+def bench(n:int=200):
+    from rules import new_builder, new_freebies
+    B, F = new_builder(), new_freebies()
+    B["concept"].update(name="Bench", clan="Brujah"); B["disciplines"] = {"Potence": 2, "Celerity": 1}
+    packed = pack(B, F)
+    for kind, (build, _, _) in FORMATS.items():
+        t0 = time.perf_counter()
+        for _ in range(n): build(B, F)
+        cold = (time.perf_counter() - t0) / n
+        cache = ExportCache()
+        cache.get(B, F, kind, packed)
+        t0 = time.perf_counter()
+        for _ in range(n): cache.get(B, F, kind, packed)
+        warm = (time.perf_counter() - t0) / n
+        print(f"{kind:7s} build {cold*1e6:8.1f} us   cached {warm*1e6:6.1f} us   ({len(build(B, F))} bytes)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export artifact cache benchmark")
+    ap.add_argument("--bench", type=int, default=200, help="iterations per format")
+    bench(ap.parse_args().bench)
@@ -0,0 +1,128 @@
+"""Load test for api.py using a local keep-alive client.
+
+    python loadtest_api.py                       # starts its own server on a temp store
+    python loadtest_api.py --url http://127.0.0.1:8765 --connections 64 --seconds 10
+
+Seeds a handful of characters, then hammers the mix below and reports
+requests/second and latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from rules import new_builder, new_freebies
+
+MIX = [  # (weight, method, path template)
+    (80, "GET", "/characters/{id}/sheet"),
+    (10, "GET", "/roll?pool=7&diff=6"),
+    (5,  "GET", "/generation/9"),
+    (5,  "PUT", "/characters/{id}"),
+]
+
+def sample_character(i:int) -> dict:
+    B, F = new_builder(), new_freebies()
+    B["concept"]["name"] = f"Load Test {i}"
+    B["concept"]["clan"] = "Brujah"
+    B["attributes"]["physical"]["Strength"] = 1 + i % 4
+    B["disciplines"] = {"Celerity": 1, "Potence": 1, "Presence": 1}
+    F["abilities"]["talents"]["Brawl"] = i % 3
+    return {"builder": B, "freebies": F}
+
+def request_bytes(method:str, path:str, host:str, body:bytes=b"") -> bytes:
+    return (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body
+
+async def read_response(reader:asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head[9:12])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line[:15].lower() == b"content-length:":
+            length = int(line[15:])
+    await reader.readexactly(length)
+    return status
+
+async def worker(host:str, port:int, ids:list, deadline:float, latencies:list, errors:list, rng:random.Random):
+    reader, writer = await asyncio.open_connection(host, port)
+    weights = [m[0] for m in MIX]
+    docs = {i: json.dumps(sample_character(n)).encode() for n, i in enumerate(ids)}
+    try:
+        while time.perf_counter() < deadline:
+            _, method, tmpl = rng.choices(MIX, weights)[0]
+            char_id = rng.choice(ids)
+            body = docs[char_id] if method == "PUT" else b""
+            t0 = time.perf_counter()
+            writer.write(request_bytes(method, tmpl.format(id=char_id), host, body))
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - t0)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+def pct(sorted_vals:list, p:float) -> float:
+    return sorted_vals[min(len(sorted_vals) - 1, int(p / 100 * len(sorted_vals)))] if sorted_vals else 0.0
+
+async def run(host:str, port:int, connections:int, seconds:float, characters:int) -> dict:
+    ids = [f"lt-{i}" for i in range(characters)]
+    reader, writer = await asyncio.open_connection(host, port)
+    for n, char_id in enumerate(ids):
+        writer.write(request_bytes("PUT", f"/characters/{char_id}", host, json.dumps(sample_character(n)).encode()))
+        await read_response(reader)
+    writer.close()
+
+    latencies: list = []; errors: list = []
+    t0 = time.perf_counter()
+    deadline = t0 + seconds
+    await asyncio.gather(*(worker(host, port, ids, deadline, latencies, errors, random.Random(i)) for i in range(connections)))
+    elapsed = time.perf_counter() - t0
+    lat = sorted(latencies)
+    return {
+        "requests": len(lat), "errors": len(errors), "seconds": round(elapsed, 2),
+        "rps": round(len(lat) / elapsed),
+        "p50_ms": round(pct(lat, 50) * 1000, 3), "p95_ms": round(pct(lat, 95) * 1000, 3), "p99_ms": round(pct(lat, 99) * 1000, 3),
+    }
+
+def wait_for_port(host:str, port:int, timeout:float=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on {host}:{port} did not come up")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--url", help="existing server; omit to start one on a temp store")
+    ap.add_argument("--connections", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--characters", type=int, default=50)
+    args = ap.parse_args()
+
+    proc = None
+    if args.url:
+        u = urlsplit(args.url); host, port = u.hostname, u.port or 80
+    else:
+        host, port = "127.0.0.1", 8799
+        store = os.path.join(tempfile.mkdtemp(prefix="v20-lt-"), "lt.db")
+        proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"),
+                                 "--host", host, "--port", str(port), "--store", store], stdout=subprocess.DEVNULL)
+    try:
+        if proc:
+            wait_for_port(host, port)
+        print(json.dumps(asyncio.run(run(host, port, args.connections, args.seconds, args.characters)), indent=2))
+    finally:
+        if proc:
+            proc.terminate(); proc.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""Virtual-user load test for the Streamlit builder.
+
+    python loadtest_ui.py                          # start a server, ramp 1,2,5,10,20,40 users
+    python loadtest_ui.py --users 10,50,100 --workers 4 --slo-ms 300
+    python loadtest_ui.py --url http://127.0.0.1:8501 --pid 12345
+
+Each virtual user opens the same websocket a browser does (/_stcore/stream),
+speaks Streamlit's protobuf protocol and clicks through a realistic path:
+Concept, +1 spam on Attributes and Abilities, buying and refunding on
+Freebies, then Sheet and Export. A click's latency runs from sending the
+widget trigger to the ``script_finished`` of the run that renders the result
+(runs cut short by ``st.rerun()`` are followed through).
+
+Per user count it reports click latency p50/p95/p99, clicks per second and the
+server's CPU and RSS (from /proc), and names the saturation point: the first
+level whose throughput stops growing or whose p95 breaks ``--slo-ms``.
+Needs Streamlit installed: the protobuf classes come with it, and so does a
+websocket client (``websockets`` on Starlette-based releases, tornado before).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from rules import ABILITIES, ATTR_GROUPS
+
+# STEPS indexes (streamlit_app.STEPS)
+CONCEPT, ATTRIBUTES, ABILITIES_STEP, FREEBIES, SHEET, EXPORT = 0, 1, 2, 7, 9, 10
+
+# ======================
+# ONE VIRTUAL USER
+# ======================
+
+class _Socket:
+    """Whichever websocket client the installed Streamlit ships, as send/recv/close."""
+
+    def __init__(self, ws, tornado:bool):
+        self.ws, self.tornado = ws, tornado
+
+    @classmethod
+    async def open(cls, url:str) -> "_Socket":
+        try:
+            import websockets
+        except ImportError:
+            from tornado.websocket import websocket_connect
+            return cls(await websocket_connect(url, subprotocols=["streamlit"]), True)
+        return cls(await websockets.connect(url, subprotocols=["streamlit"], max_size=None), False)
+
+    async def send(self, data:bytes):
+        if self.tornado:
+            await self.ws.write_message(data, binary=True)
+        else:
+            await self.ws.send(data)
+
+    async def recv(self) -> Optional[bytes]:
+        if self.tornado:
+            return await self.ws.read_message()
+        from websockets.exceptions import ConnectionClosed
+        try:
+            return await self.ws.recv()
+        except ConnectionClosed:
+            return None
+
+    async def close(self):
+        if self.tornado:
+            self.ws.close()
+        else:
+            await self.ws.close()
+
+class VirtualUser:
+    def __init__(self, base_url:str, sid:str):
+        u = urlsplit(base_url)
+        self.http = f"{u.scheme}://{u.netloc}"
+        self.ws_url = f"{'wss' if u.scheme == 'https' else 'ws'}://{u.netloc}/_stcore/stream"
+        self.sid = sid
+        self.ws = None
+        self.page_script_hash = ""
+        self.widgets: Dict[str, Tuple[str, bool]] = {}  # user key (or label) -> (widget id, disabled)
+        self.cache: Dict[str, object] = {}
+
+    async def connect(self):
+        self.ws = await _Socket.open(self.ws_url)
+        return await self.run()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def run(self, widget_id:Optional[str]=None) -> float:
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        msg = BackMsg()
+        cs = msg.rerun_script
+        cs.query_string = f"sid={self.sid}"
+        cs.page_script_hash = self.page_script_hash
+        if widget_id:
+            w = cs.widget_states.widgets.add()
+            w.id = widget_id
+            w.trigger_value = True
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        await self._until_rendered()
+        return time.perf_counter() - t0
+
+    async def click(self, key:str) -> Optional[float]:
+        """Press the button with this key (or label); None if it is missing or disabled."""
+        found = self.widgets.get(key)
+        if found is None or found[1]:
+            return None
+        return await self.run(found[0])
+
+    async def _until_rendered(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        early = getattr(ForwardMsg, "FINISHED_EARLY_FOR_RERUN", 2)
+        widgets: Dict[str, Tuple[str, bool]] = {}
+        while True:
+            raw = await self.ws.recv()
+            if raw is None:
+                raise ConnectionError("server closed the websocket")
+            fm = ForwardMsg(); fm.ParseFromString(raw)
+            fm = self._resolve(fm)
+            kind = fm.WhichOneof("type")
+            if kind == "new_session":
+                self.page_script_hash = getattr(fm.new_session, "page_script_hash", "") or self.page_script_hash
+            elif kind == "delta":
+                self._collect(fm.delta, widgets)
+            elif kind == "script_finished":
+                if fm.script_finished == early:
+                    widgets = {}  # the rerun repaints everything
+                    continue
+                self.widgets = widgets
+                return
+
+    def _resolve(self, fm):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        if fm.WhichOneof("type") == "ref_hash":
+            h = fm.ref_hash
+            cached = self.cache.get(h)
+            if cached is None:
+                cached = ForwardMsg()
+                cached.ParseFromString(urlopen(f"{self.http}/_stcore/message?hash={h}", timeout=10).read())
+                self.cache[h] = cached
+            return cached
+        if fm.hash:
+            self.cache[fm.hash] = fm
+        return fm
+
+    @staticmethod
+    def _collect(delta, widgets:dict):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        el = delta.new_element
+        kind = el.WhichOneof("type")
+        sub = getattr(el, kind) if kind else None
+        wid = getattr(sub, "id", "") if sub is not None else ""
+        if not wid:
+            return
+        key = wid.split("-", 2)[2] if wid.startswith("$$ID-") and wid.count("-") >= 2 else wid
+        disabled = bool(getattr(sub, "disabled", False))
+        widgets[key] = (wid, disabled)
+        label = getattr(sub, "label", "")
+        if key == "None" and label:
+            widgets.setdefault(label, (wid, disabled))
+
+# ======================
+# CLICK PATH
+# ======================
+
+async def click_path(vu:VirtualUser, rng:random.Random, lat:List[float], errors:List[str]):
+    async def click(key:str) -> bool:
+        try:
+            t = await vu.click(key)
+        except Exception as e:  # count and keep the user going
+            errors.append(f"{key}: {e}")
+            return False
+        if t is None:
+            return False
+        lat.append(t)
+        return True
+
+    await click(f"nav-{CONCEPT}")
+
+    await click(f"nav-{ATTRIBUTES}")
+    attr_keys = [f"attr-inc-{g}-{s}" for g,_,stats in ATTR_GROUPS for s in stats]
+    for _ in range(20):
+        if not await click(rng.choice(attr_keys)):
+            open_keys = [k for k in attr_keys if k in vu.widgets and not vu.widgets[k][1]]
+            if not open_keys: break
+            await click(rng.choice(open_keys))
+
+    await click(f"nav-{ABILITIES_STEP}")
+    abil_keys = [f"abil-inc-{c}-{n}" for c,names in ABILITIES.items() for n in names]
+    for _ in range(30):
+        if not await click(rng.choice(abil_keys)):
+            open_keys = [k for k in abil_keys if k in vu.widgets and not vu.widgets[k][1]]
+            if not open_keys: break
+            await click(rng.choice(open_keys))
+
+    await click(f"nav-{FREEBIES}")
+    buys = [f"fb-attr-{g}-{s}" for g,_,stats in ATTR_GROUPS for s in stats] + \
+           [f"fb-abil-{c}-{n}" for c,names in ABILITIES.items() for n in names]
+    bought = []
+    for _ in range(8):
+        k = rng.choice(buys)
+        if await click(k): bought.append(k)
+    for k in bought[:3]:
+        await click(k.replace("fb-attr-", "fb-attr-refund-").replace("fb-abil-", "fb-abil-refund-"))
+
+    await click(f"nav-{SHEET}")
+    await click(f"nav-{EXPORT}")
+
+async def run_users(url:str, sids:List[str], seed:int, rounds:int) -> Tuple[List[float], List[str], float]:
+    lat: List[float] = []; errors: List[str] = []
+    t0 = time.perf_counter()
+
+    async def one(i:int, sid:str):
+        rng = random.Random(seed * 1000 + i)
+        await asyncio.sleep(rng.random() * 0.5)  # don't connect everyone in the same millisecond
+        vu = VirtualUser(url, sid)
+        try:
+            await vu.connect()
+            for r in range(rounds):
+                vu.sid = f"{sid}-r{r}"  # a fresh character each round
+                await vu.run()
+                await click_path(vu, rng, lat, errors)
+        except Exception as e:
+            errors.append(f"{sid}: {e}")
+        finally:
+            await vu.close()
+
+    await asyncio.gather(*(one(i, s) for i, s in enumerate(sids)))
+    return lat, errors, time.perf_counter() - t0
+
+def _worker(args) -> Tuple[List[float], List[str], float]:
+    url, sids, seed, rounds = args
+    return asyncio.run(run_users(url, sids, seed, rounds))
+
+# ======================
+# SERVER + MEASUREMENT
+# ======================
+
+def proc_sample(pid:int) -> Tuple[float, int]:
+    """(CPU seconds used so far, RSS bytes) of ``pid`` and its children, from /proc."""
+    cpu, rss = 0.0, 0
+    tick = os.sysconf("SC_CLK_TCK")
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / tick
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return cpu, rss
+
+class Monitor(threading.Thread):
+    def __init__(self, pid:Optional[int], interval:float=0.5):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.samples: List[Tuple[float, float, int]] = []
+        self._halt = threading.Event()
+
+    def sample(self):
+        cpu, rss = proc_sample(self.pid)
+        self.samples.append((time.perf_counter(), cpu, rss))
+
+    def run(self):
+        while self.pid and not self._halt.is_set():
+            self.sample()
+            self._halt.wait(self.interval)
+
+    def stop(self) -> dict:
+        self._halt.set(); self.join()
+        if self.pid:
+            self.sample()  # short levels may end before the second tick
+        if len(self.samples) < 2:
+            return {"cpu_pct": None, "rss_mb": None}
+        (t0, c0, _), (t1, c1, _) = self.samples[0], self.samples[-1]
+        return {"cpu_pct": round(100 * (c1 - c0) / max(1e-9, t1 - t0), 1),
+                "rss_mb": round(max(s[2] for s in self.samples) / 2**20, 1)}
+
+def start_server(port:int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("V20_STORE", os.path.join(tempfile.mkdtemp(prefix="v20-ui-lt-"), "lt.db"))
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false", "--server.fileWatcherType", "none"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    end = time.time() + 60
+    while time.time() < end:
+        try:
+            if urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("streamlit server did not become healthy")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def pct(vals:List[float], p:float) -> Optional[float]:
+    return round(vals[min(len(vals) - 1, int(p / 100 * len(vals)))] * 1000, 1) if vals else None
+
+def run_level(url:str, users:int, workers:int, rounds:int, pid:Optional[int], seed:int) -> dict:
+    sids = [f"lt-{users}u-{i}" for i in range(users)]
+    shards = [sids[i::workers] for i in range(workers) if sids[i::workers]]
+    mon = Monitor(pid); mon.start()
+    t0 = time.perf_counter()
+    if len(shards) == 1:
+        results = [_worker((url, shards[0], seed, rounds))]
+    else:
+        with ProcessPoolExecutor(len(shards)) as ex:
+            results = list(ex.map(_worker, [(url, s, seed + i, rounds) for i, s in enumerate(shards)]))
+    elapsed = time.perf_counter() - t0
+    lat = sorted(t for r in results for t in r[0])
+    errors = [e for r in results for e in r[1]]
+    return {
+        "users": users, "clicks": len(lat), "errors": len(errors),
+        "clicks_per_s": round(len(lat) / elapsed, 1),
+        "p50_ms": pct(lat, 50), "p95_ms": pct(lat, 95), "p99_ms": pct(lat, 99),
+        **mon.stop(),
+        "first_error": errors[0] if errors else "",
+    }
+
+def saturation(levels:List[dict], slo_ms:float) -> Optional[int]:
+    prev = None
+    for lv in levels:
+        if lv["p95_ms"] is not None and lv["p95_ms"] > slo_ms:
+            return lv["users"]
+        if prev and lv["clicks_per_s"] < prev["clicks_per_s"] * 1.10:
+            return prev["users"]
+        prev = lv
+    return None
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--url", help="running app; omit to start one on a free port")
+    ap.add_argument("--pid", type=int, help="server pid for CPU/RSS when --url is given")
+    ap.add_argument("--users", default="1,2,5,10,20,40", help="comma-separated virtual user counts to ramp through")
+    ap.add_argument("--rounds", type=int, default=1, help="click paths per user per level")
+    ap.add_argument("--workers", type=int, default=1, help="client processes (keep the client from being the bottleneck)")
+    ap.add_argument("--slo-ms", type=float, default=500.0, help="p95 click latency considered saturated")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = ap.parse_args()
+
+    proc = None
+    url, pid = args.url, args.pid
+    if not url:
+        port = free_port()
+        proc = start_server(port)
+        url, pid = f"http://127.0.0.1:{port}", proc.pid
+    try:
+        levels = []
+        for n in [int(x) for x in args.users.split(",") if x.strip()]:
+            lv = run_level(url, n, max(1, min(args.workers, n)), args.rounds, pid, args.seed)
+            levels.append(lv)
+            if not args.json:
+                print(f"{lv['users']:>5} users  {lv['clicks_per_s']:>7} clicks/s  p50 {lv['p50_ms']} ms  p95 {lv['p95_ms']} ms  "
+                      f"p99 {lv['p99_ms']} ms  cpu {lv['cpu_pct']}%  rss {lv['rss_mb']} MB  errors {lv['errors']}", flush=True)
+        sat = saturation(levels, args.slo_ms)
+        if args.json:
+            print(json.dumps({"levels": levels, "saturation_users": sat}, indent=2))
+        else:
+            print(f"saturation: {sat} users" if sat else "saturation: not reached; try more --users")
+    finally:
+        if proc:
+            proc.terminate(); proc.wait()
+
+if __name__ == "__main__":
+    main()
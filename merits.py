@@ -0,0 +1,317 @@
+"""Merits & Flaws catalog, compiled to bitsets.
+
+Every catalog entry owns one bit of an int, and so does every fact a
+prerequisite or exclusion mentions (``"Charisma 3"`` = Charisma of 3 or more
+with freebies, ``"clan:Nosferatu"``). Compiling the catalog once gives each
+entry an exclusion mask (made symmetric between entries) and a requirement
+mask, so validating a character's picks is a few integer ANDs per pick,
+however large the catalog, and whole archives can be checked in bulk.
+
+Merits cost their points from the freebie pool; flaws add theirs, up to the
+edition's flaw cap. Kept free of ``rules`` imports so the rules core can use
+it for pool accounting.
+
+    python merits.py --check-store characters.db   # check every stored character
+    python merits.py --bench 100000                # selections validated per second
+"""
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+CATEGORIES = ["Physical", "Mental", "Social", "Supernatural"]
+
+# (name, "merit"/"flaw", category, points, requires, excludes)
+CATALOG: List[tuple] = [
+    # ---- Physical ----
+    ("Acute Sense",            "merit", "Physical", 1, (), ()),
+    ("Ambidextrous",           "merit", "Physical", 1, (), ()),
+    ("Eat Food",               "merit", "Physical", 1, (), ()),
+    ("Blush of Health",        "merit", "Physical", 2, (), ("Smell of the Grave", "clan:Nosferatu")),
+    ("Enchanting Voice",       "merit", "Physical", 2, (), ("Mute",)),
+    ("Daredevil",              "merit", "Physical", 3, (), ()),
+    ("Efficient Digestion",    "merit", "Physical", 3, (), ()),
+    ("Huge Size",              "merit", "Physical", 4, (), ("Short",)),
+    ("Hard of Hearing",        "flaw",  "Physical", 1, (), ("Deaf",)),
+    ("Short",                  "flaw",  "Physical", 1, (), ()),
+    ("Smell of the Grave",     "flaw",  "Physical", 1, (), ()),
+    ("Bad Sight",              "flaw",  "Physical", 1, (), ("Blind",)),
+    ("One Eye",                "flaw",  "Physical", 2, (), ("Blind",)),
+    ("Disfigured",             "flaw",  "Physical", 2, (), ()),
+    ("Lame",                   "flaw",  "Physical", 3, (), ()),
+    ("Monstrous",              "flaw",  "Physical", 3, (), ()),
+    ("Permanent Wound",        "flaw",  "Physical", 3, (), ()),
+    ("Mute",                   "flaw",  "Physical", 4, (), ()),
+    ("Deaf",                   "flaw",  "Physical", 4, (), ()),
+    ("Blind",                  "flaw",  "Physical", 6, (), ()),
+    # ---- Mental ----
+    ("Common Sense",           "merit", "Mental", 1, (), ()),
+    ("Concentration",          "merit", "Mental", 1, (), ()),
+    ("Time Sense",             "merit", "Mental", 1, (), ()),
+    ("Code of Honor",          "merit", "Mental", 2, (), ()),
+    ("Eidetic Memory",         "merit", "Mental", 2, (), ("Amnesia",)),
+    ("Light Sleeper",          "merit", "Mental", 2, (), ("Deep Sleeper",)),
+    ("Calm Heart",             "merit", "Mental", 3, (), ("Short Fuse",)),
+    ("Iron Will",              "merit", "Mental", 3, (), ("Weak-Willed",)),
+    ("Deep Sleeper",           "flaw",  "Mental", 1, (), ()),
+    ("Nightmares",             "flaw",  "Mental", 1, (), ()),
+    ("Prey Exclusion",         "flaw",  "Mental", 1, (), ()),
+    ("Shy",                    "flaw",  "Mental", 1, (), ()),
+    ("Soft-Hearted",           "flaw",  "Mental", 1, (), ()),
+    ("Amnesia",                "flaw",  "Mental", 2, (), ()),
+    ("Phobia",                 "flaw",  "Mental", 2, (), ()),
+    ("Short Fuse",             "flaw",  "Mental", 2, (), ()),
+    ("Vengeful",               "flaw",  "Mental", 2, (), ()),
+    ("Weak-Willed",            "flaw",  "Mental", 3, (), ()),
+    # ---- Social ----
+    ("Elysium Regular",        "merit", "Social", 1, (), ()),
+    ("Former Ghoul",           "merit", "Social", 1, (), ()),
+    ("Harmless",               "merit", "Social", 1, (), ("Monstrous",)),
+    ("Natural Leader",         "merit", "Social", 1, ("Charisma 3",), ()),
+    ("Prestigious Sire",       "merit", "Social", 1, (), ("Infamous Sire",)),
+    ("Reputation",             "merit", "Social", 2, (), ()),
+    ("Sabbat Survivor",        "merit", "Social", 2, (), ()),
+    ("Clan Friendship",        "merit", "Social", 3, (), ("Clan Enmity",)),
+    ("Dark Secret",            "flaw",  "Social", 1, (), ()),
+    ("Infamous Sire",          "flaw",  "Social", 1, (), ()),
+    ("Mistaken Identity",      "flaw",  "Social", 1, (), ()),
+    ("Sire's Resentment",      "flaw",  "Social", 1, (), ()),
+    ("Enemy",                  "flaw",  "Social", 2, (), ()),
+    ("Clan Enmity",            "flaw",  "Social", 3, (), ()),
+    ("Hunted",                 "flaw",  "Social", 4, (), ()),
+    # ---- Supernatural ----
+    ("Magic Resistance",       "merit", "Supernatural", 2, (), ()),
+    ("Medium",                 "merit", "Supernatural", 2, (), ()),
+    ("Lucky",                  "merit", "Supernatural", 3, (), ("Cursed",)),
+    ("Oracular Ability",       "merit", "Supernatural", 3, (), ()),
+    ("Unbondable",             "merit", "Supernatural", 3, (), ()),
+    ("True Love",              "merit", "Supernatural", 4, (), ()),
+    ("Nine Lives",             "merit", "Supernatural", 6, (), ("Dark Fate",)),
+    ("True Faith",             "merit", "Supernatural", 7, ("Humanity 7",), ()),
+    ("Cast No Reflection",     "flaw",  "Supernatural", 1, (), ()),
+    ("Repelled by Garlic",     "flaw",  "Supernatural", 1, (), ()),
+    ("Touch of Frost",         "flaw",  "Supernatural", 1, (), ("Blush of Health",)),
+    ("Cursed",                 "flaw",  "Supernatural", 2, (), ()),
+    ("Eerie Presence",         "flaw",  "Supernatural", 2, (), ()),
+    ("Beacon of the Unholy",   "flaw",  "Supernatural", 2, (), ()),
+    ("Can't Cross Running Water", "flaw", "Supernatural", 3, (), ()),
+    ("Haunted",                "flaw",  "Supernatural", 3, (), ()),
+    ("Dark Fate",              "flaw",  "Supernatural", 5, (), ()),
+]
+
+# ======================
+# COMPILE
+# ======================
+
+INDEX: Dict[str, int] = {e[0]: i for i, e in enumerate(CATALOG)}
+ENTRIES: Dict[str, dict] = {
+    e[0]: {"kind": e[1], "category": e[2], "points": e[3], "requires": list(e[4]), "excludes": list(e[5])} for e in CATALOG
+}
+POINTS = [e[3] for e in CATALOG]
+MERIT_MASK = sum(1 << i for i, e in enumerate(CATALOG) if e[1] == "merit")
+FLAW_MASK = sum(1 << i for i, e in enumerate(CATALOG) if e[1] == "flaw")
+
+_FACT_RE = re.compile(r"^(clan:(?P<clan>.+)|(?P<trait>[A-Za-z][A-Za-z .'-]*) (?P<min>\d+))$")
+FACTS: List[str] = sorted({x for e in CATALOG for x in e[4] + e[5] if x not in INDEX})
+FACT_BIT: Dict[str, int] = {f: 1 << (len(CATALOG) + j) for j, f in enumerate(FACTS)}
+ALL_FACTS = sum(FACT_BIT.values())
+
+def _bit(name:str) -> int:
+    return 1 << INDEX[name] if name in INDEX else FACT_BIT[name]
+
+EXCLUDES = [0] * len(CATALOG)
+REQUIRES = [0] * len(CATALOG)
+for _i, _e in enumerate(CATALOG):
+    for _x in _e[5]:
+        EXCLUDES[_i] |= _bit(_x)
+        if _x in INDEX:  # exclusions between entries work both ways
+            EXCLUDES[INDEX[_x]] |= 1 << _i
+    for _x in _e[4]:
+        REQUIRES[_i] |= _bit(_x)
+
+def _trait_total(B:dict, F:dict, name:str) -> int:
+    """Base + freebies of any trait by name; uncapped, which is all a minimum needs."""
+    if name == "Humanity":
+        v = B["virtues"]; fv = F["virtues"]
+        return v["Conscience"] + fv["Conscience"] + v["SelfControl"] + fv["SelfControl"] + F["humanity"]
+    if name == "Willpower":
+        return B["virtues"]["Courage"] + F["virtues"]["Courage"] + F["willpower"]
+    for section in ("attributes", "abilities"):
+        for group, vals in B[section].items():
+            if group != "priorities" and name in vals:
+                return vals[name] + F[section].get(group, {}).get(name, 0)
+    for section in ("disciplines", "backgrounds", "virtues"):
+        if name in B[section] or name in F[section]:
+            return B[section].get(name, 0) + F[section].get(name, 0)
+    return 0
+
+def _compile_fact(fact:str) -> Callable[[dict, dict], bool]:
+    m = _FACT_RE.match(fact)
+    if m is None:
+        raise ValueError(f"catalog names {fact!r}, which is neither an entry nor a fact like 'Charisma 3' or 'clan:Nosferatu'")
+    if m.group("clan"):
+        clan = m.group("clan")
+        return lambda B, F: B["concept"]["clan"] == clan
+    trait, minimum = m.group("trait"), int(m.group("min"))
+    return lambda B, F: _trait_total(B, F, trait) >= minimum
+
+FACT_TESTS: List[Tuple[int, Callable[[dict, dict], bool]]] = [(FACT_BIT[f], _compile_fact(f)) for f in FACTS]
+
+# ======================
+# MASKS
+# ======================
+
+def _bits(mask:int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def mask_of(names:Iterable[str]) -> Tuple[int, List[str]]:
+    """Selection mask and any names the catalog doesn't know."""
+    mask, unknown = 0, []
+    for n in names:
+        i = INDEX.get(n)
+        if i is None: unknown.append(n)
+        else: mask |= 1 << i
+    return mask, unknown
+
+def names_of(mask:int) -> List[str]:
+    return [CATALOG[i][0] for i in _bits(mask & ~ALL_FACTS)]
+
+def facts_of(B:dict, F:dict) -> int:
+    mask = 0
+    for bit, test in FACT_TESTS:
+        if test(B, F): mask |= bit
+    return mask
+
+def valid(sel:int, facts:int) -> bool:
+    """The fast path: no pick excludes anything held, every requirement is held."""
+    have = sel | facts
+    for i in _bits(sel):
+        if EXCLUDES[i] & have or REQUIRES[i] & ~have:
+            return False
+    return True
+
+def available(sel:int, facts:int) -> int:
+    """Entries that could be added to ``sel`` right now."""
+    have, out = sel | facts, 0
+    for i in range(len(CATALOG)):
+        if not (sel >> i) & 1 and not EXCLUDES[i] & have and not REQUIRES[i] & ~have:
+            out |= 1 << i
+    return out
+
+def points(sel:int) -> Tuple[int, int]:
+    """(merit points, flaw points) of a selection."""
+    m = f = 0
+    for i in _bits(sel):
+        if (MERIT_MASK >> i) & 1: m += POINTS[i]
+        else: f += POINTS[i]
+    return m, f
+
+def balance(names:Iterable[str], flaw_cap:int) -> int:
+    """Freebies the picks add to the pool (negative when merits outweigh flaws)."""
+    m, f = points(mask_of(names)[0])
+    return min(f, flaw_cap) - m
+
+def affordable(sel:int, pool:int, flaw_cap:int) -> int:
+    """Mask of the entries that can be toggled (picked or dropped) without
+    taking the pool below 0; dropping a Flaw gives its freebies back too."""
+    m, f = points(sel)
+    now, out = min(f, flaw_cap) - m, 0
+    for i, p in enumerate(POINTS):
+        d = -p if (sel >> i) & 1 else p
+        if (MERIT_MASK >> i) & 1:
+            after = min(f, flaw_cap) - (m + d)
+        else:
+            after = min(f + d, flaw_cap) - m
+        if pool + after - now >= 0:
+            out |= 1 << i
+    return out
+
+# ======================
+# CHARACTERS
+# ======================
+
+def explain(B:dict, F:dict) -> List[str]:
+    """Every problem with a character's picks; empty when they are legal."""
+    sel, unknown = mask_of(B.get("merits", ()))
+    out = [f"{n}: not in the Merits & Flaws catalog" for n in unknown]
+    facts = facts_of(B, F)
+    if valid(sel, facts):
+        return out
+    have = sel | facts
+    for i in _bits(sel):
+        name = CATALOG[i][0]
+        for j in _bits(EXCLUDES[i] & have):
+            other = CATALOG[j][0] if j < len(CATALOG) else FACTS[j - len(CATALOG)]
+            if j > i:  # entry pairs exclude both ways; report each once (facts sort after entries)
+                out.append(f"{name}: can't be taken with {other}")
+        for j in _bits(REQUIRES[i] & ~have):
+            out.append(f"{name}: requires {CATALOG[j][0] if j < len(CATALOG) else FACTS[j - len(CATALOG)]}")
+    return out
+
+def set_picks(B:dict, F:dict, names:Sequence[str], flaw_cap:int) -> List[str]:
+    """Replace the picks and move the freebie pool by the change in their balance.
+
+    Returns an empty list, or why the change was refused (it would leave the
+    pool below 0) with ``B`` and ``F`` untouched.
+    """
+    mask, unknown = mask_of(names)
+    picks = names_of(mask) + sorted(set(unknown))  # catalog order; keep what we can't price
+    cost = balance(B.get("merits", ()), flaw_cap) - balance(picks, flaw_cap)
+    if cost > F["pool"]:
+        return [f"these picks cost {cost} freebies but only {F['pool']} are left"]
+    B["merits"] = picks
+    F["pool"] -= cost
+    return []
+
+def check_archive(docs:Iterable[Tuple[str, dict]]) -> Dict[str, List[str]]:
+    """Problems per character id for every ``{"builder", "freebies"}`` document
+    whose picks are not legal; ids that check clean are left out."""
+    bad = {}
+    for char_id, doc in docs:
+        B, F = doc["builder"], doc["freebies"]
+        sel, unknown = mask_of(B.get("merits", ()))
+        if unknown or not valid(sel, facts_of(B, F)):
+            bad[char_id] = explain(B, F)
+    return bad
+
+# ======================
+# CLI
+# ======================
+
+def _stored(path:str) -> Iterator[Tuple[str, dict]]:
+    from store import CharacterStore
+    store = CharacterStore(path)
+    try:
+        for row in store.list():
+            doc = store.get(row["id"])
+            if doc is not None:
+                yield row["id"], doc
+    finally:
+        store.close()
+
+def bench(n:int):
+    rng = random.Random(1)
+    sels = [mask_of(rng.sample(list(INDEX), rng.randint(1, 6)))[0] for _ in range(n)]
+    facts = [rng.getrandbits(len(FACTS)) << len(CATALOG) for _ in range(n)]
+    t0 = time.perf_counter()
+    ok = sum(valid(s, f) for s, f in zip(sels, facts))
+    dt = time.perf_counter() - t0
+    print(f"{n} selections in {dt*1000:.1f} ms ({n/dt:,.0f}/s), {ok} legal")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Merits & Flaws catalog checks")
+    ap.add_argument("--check-store", metavar="DB", help="check every character in a store")
+    ap.add_argument("--bench", type=int, default=0, help="validate N random selections")
+    args = ap.parse_args()
+    if args.check_store:
+        t0 = time.perf_counter()
+        bad = check_archive(_stored(args.check_store))
+        for char_id, problems in sorted(bad.items()):
+            print(f"{char_id}:"); print("".join(f"  - {p}\n" for p in problems), end="")
+        print(f"{len(bad)} character(s) with problems ({time.perf_counter() - t0:.2f} s)")
+    if args.bench or not args.check_store:
+        bench(args.bench or 100000)
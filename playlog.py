@@ -0,0 +1,201 @@
+"""Event-sourced resource tracker for play sessions.
+
+Every change to a character's Blood, Willpower or Humanity during a night is
+appended to ``events``; nothing is updated in place. Two derived tables keep
+reads cheap:
+
+* ``heads`` holds the current state and is written in the same transaction as
+  the event, so loading the current state is one primary-key lookup.
+* ``snapshots`` are taken every ``SNAPSHOT_EVERY`` events, so rewinding to any
+  point replays at most that many events.
+
+``compact`` drops events and snapshots older than the retained window;
+``Compactor`` runs it on a background thread.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from rules import caps_of, gen_info, total_humanity, total_willpower
+from store import DEFAULT_PATH
+
+SNAPSHOT_EVERY = 50
+KEEP_SNAPSHOTS = 4  # compaction keeps this many snapshots (and the events after the oldest)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    char_id TEXT NOT NULL, seq INTEGER NOT NULL, ts REAL NOT NULL,
+    kind TEXT NOT NULL, amount INTEGER NOT NULL DEFAULT 0, note TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (char_id, seq)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    char_id TEXT NOT NULL, seq INTEGER NOT NULL, state TEXT NOT NULL,
+    PRIMARY KEY (char_id, seq)
+);
+CREATE TABLE IF NOT EXISTS heads (
+    char_id TEXT PRIMARY KEY, seq INTEGER NOT NULL, state TEXT NOT NULL
+);
+"""
+
+KINDS = ["start","spend_blood","feed","new_turn","spend_willpower","regain_willpower","humanity","dawn"]
+
+def initial_state(B:dict, F:dict) -> dict:
+    GI = gen_info(B["concept"]["generation"])
+    wp = total_willpower(B, F)
+    return {
+        "blood": GI["bloodPool"], "bloodPool": GI["bloodPool"], "bloodPerTurn": GI["bloodPerTurn"],
+        "willpower": wp, "willpowerMax": wp, "humanity": total_humanity(B, F),
+        "humanityMax": caps_of(B)["humanity"],  # the edition's cap, fixed for the night
+        "turn": 0, "spentThisTurn": 0,
+    }
+
+def apply(state:Optional[dict], kind:str, amount:int, note:str) -> dict:
+    """Pure transition; raises ValueError for moves the rules don't allow."""
+    if kind == "start":
+        return json.loads(note)
+    if state is None:
+        raise ValueError("no session started for this character")
+    s = dict(state)
+    if kind == "spend_blood":
+        if amount > s["blood"]:
+            raise ValueError(f"only {s['blood']} Blood left")
+        if s["spentThisTurn"] + amount > s["bloodPerTurn"]:
+            raise ValueError(f"Blood per Turn is {s['bloodPerTurn']}")
+        s["blood"] -= amount; s["spentThisTurn"] += amount
+    elif kind == "feed":
+        s["blood"] = min(s["bloodPool"], s["blood"] + amount)
+    elif kind == "new_turn":
+        s["turn"] += 1; s["spentThisTurn"] = 0
+    elif kind == "spend_willpower":
+        if amount > s["willpower"]:
+            raise ValueError(f"only {s['willpower']} Willpower left")
+        s["willpower"] -= amount
+    elif kind == "regain_willpower":
+        s["willpower"] = min(s["willpowerMax"], s["willpower"] + amount)
+    elif kind == "humanity":
+        s["humanity"] = max(0, min(s.get("humanityMax", 10), s["humanity"] + amount))
+    elif kind == "dawn":  # rising costs 1 Blood; a night's rest restores 1 Willpower
+        s["blood"] = max(0, s["blood"] - 1)
+        s["willpower"] = min(s["willpowerMax"], s["willpower"] + 1)
+        s["turn"] = 0; s["spentThisTurn"] = 0
+    else:
+        raise ValueError(f"unknown event kind: {kind}")
+    return s
+
+class PlayLog:
+    def __init__(self, path:str=DEFAULT_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    # ---- reads ----
+
+    def current(self, char_id:str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT seq, state FROM heads WHERE char_id=?", (char_id,)).fetchone()
+        return dict(json.loads(row[1]), seq=row[0]) if row else None
+
+    def events(self, char_id:str, limit:int=50) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, ts, kind, amount, note FROM events WHERE char_id=? ORDER BY seq DESC LIMIT ?", (char_id, limit)
+            ).fetchall()
+        return [{"seq": r[0], "ts": r[1], "kind": r[2], "amount": r[3], "note": r[4] if r[2] != "start" else ""} for r in rows]
+
+    def state_at(self, char_id:str, seq:int) -> dict:
+        """State right after event ``seq``: nearest snapshot, then replay the gap."""
+        with self._lock:
+            snap = self._conn.execute(
+                "SELECT seq, state FROM snapshots WHERE char_id=? AND seq<=? ORDER BY seq DESC LIMIT 1", (char_id, seq)
+            ).fetchone()
+            if snap is None:
+                raise ValueError(f"event {seq} was compacted away (or never existed)")
+            rows = self._conn.execute(
+                "SELECT kind, amount, note FROM events WHERE char_id=? AND seq>? AND seq<=? ORDER BY seq", (char_id, snap[0], seq)
+            ).fetchall()
+        state = json.loads(snap[1])
+        for kind, amount, note in rows:
+            state = apply(state, kind, amount, note)
+        return state
+
+    # ---- writes ----
+
+    def start(self, char_id:str, B:dict, F:dict) -> dict:
+        return self.append(char_id, "start", 0, json.dumps(initial_state(B, F)))
+
+    def append(self, char_id:str, kind:str, amount:int=0, note:str="") -> dict:
+        with self._lock:
+            c = self._conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                row = c.execute("SELECT seq, state FROM heads WHERE char_id=?", (char_id,)).fetchone()
+                seq = row[0] + 1 if row else 1
+                state = apply(json.loads(row[1]) if row else None, kind, amount, note)
+                blob = json.dumps(state)
+                c.execute("INSERT INTO events(char_id, seq, ts, kind, amount, note) VALUES(?,?,?,?,?,?)",
+                          (char_id, seq, time.time(), kind, amount, note))
+                c.execute("INSERT INTO heads(char_id, seq, state) VALUES(?,?,?) "
+                          "ON CONFLICT(char_id) DO UPDATE SET seq=excluded.seq, state=excluded.state", (char_id, seq, blob))
+                if kind == "start" or seq % SNAPSHOT_EVERY == 0:
+                    c.execute("INSERT OR REPLACE INTO snapshots(char_id, seq, state) VALUES(?,?,?)", (char_id, seq, blob))
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+        return dict(state, seq=seq)
+
+    def rewind(self, char_id:str, seq:int) -> dict:
+        """Undo everything after ``seq``; later events and snapshots are dropped."""
+        state = self.state_at(char_id, seq)
+        with self._lock:
+            c = self._conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                c.execute("DELETE FROM events WHERE char_id=? AND seq>?", (char_id, seq))
+                c.execute("DELETE FROM snapshots WHERE char_id=? AND seq>?", (char_id, seq))
+                c.execute("UPDATE heads SET seq=?, state=? WHERE char_id=?", (seq, json.dumps(state), char_id))
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+        return dict(state, seq=seq)
+
+    def compact(self, char_id:str, keep_snapshots:int=KEEP_SNAPSHOTS) -> int:
+        """Drop history older than the ``keep_snapshots`` newest snapshots. Returns events removed."""
+        with self._lock:
+            c = self._conn
+            row = c.execute(
+                "SELECT seq FROM snapshots WHERE char_id=? ORDER BY seq DESC LIMIT 1 OFFSET ?", (char_id, keep_snapshots - 1)
+            ).fetchone()
+            if row is None:
+                return 0
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                n = c.execute("DELETE FROM events WHERE char_id=? AND seq<=?", (char_id, row[0])).rowcount
+                c.execute("DELETE FROM snapshots WHERE char_id=? AND seq<?", (char_id, row[0]))
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+        return n
+
+    def compact_all(self) -> int:
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute("SELECT char_id FROM heads").fetchall()]
+        return sum(self.compact(i) for i in ids)
+
+class Compactor(threading.Thread):
+    def __init__(self, log:PlayLog, interval:float=300.0):
+        super().__init__(daemon=True, name="playlog-compactor")
+        self.log, self.interval = log, interval
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            self.log.compact_all()
+
+    def stop(self):
+        self._halt.set()
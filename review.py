@@ -0,0 +1,208 @@
+"""Storyteller approval queue with trait-level diffs between revisions.
+
+Players submit ``{"builder", "freebies"}`` documents; each submission becomes
+a numbered revision of its character. A pending revision is diffed against
+the character's last approved revision (or its previous one if nothing was
+approved yet).
+
+Diffs walk two hash trees: every dict node carries a digest of its children,
+so identical subtrees (most of a resubmitted sheet) are skipped without
+looking inside. Trees are cached per submission, so a revision is hashed
+once no matter how often it is diffed.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import merits
+from rules import Edition, check_character, edition_of
+from store import DEFAULT_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    char_id   TEXT NOT NULL,
+    revision  INTEGER NOT NULL,
+    player    TEXT NOT NULL DEFAULT '',
+    payload   TEXT NOT NULL,
+    digest    TEXT NOT NULL,
+    status    TEXT NOT NULL DEFAULT 'pending',
+    submitted REAL NOT NULL,
+    reviewed  REAL,
+    comment   TEXT NOT NULL DEFAULT '',
+    UNIQUE (char_id, revision)
+);
+CREATE INDEX IF NOT EXISTS submissions_status ON submissions(status, submitted);
+"""
+
+# freebies sections -> edition cost key
+FREEBIE_KIND = {
+    "attributes":"attribute", "abilities":"ability", "disciplines":"discipline",
+    "backgrounds":"background", "virtues":"virtue", "humanity":"humanity", "willpower":"willpower",
+}
+
+# ======================
+# HASH TREES + DIFF
+# ======================
+
+def _h(data:bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=12).digest()
+
+def hash_tree(obj) -> tuple:
+    """(digest, children) for dicts, (digest, value) for leaves."""
+    if isinstance(obj, dict):
+        kids = {str(k): hash_tree(v) for k, v in obj.items()}
+        return _h(b"d" + b"".join(k.encode() + b"\0" + kids[k][0] for k in sorted(kids))), kids
+    return _h(b"l" + json.dumps(obj, sort_keys=True).encode()), obj
+
+def _leaves(node:tuple, path:tuple, out:dict):
+    body = node[1]
+    if isinstance(body, dict):
+        for k, child in body.items():
+            _leaves(child, path + (k,), out)
+    else:
+        out[path] = body
+
+def diff_trees(a:Optional[tuple], b:Optional[tuple], path:tuple=()) -> List[Tuple[tuple, object, object]]:
+    """(path, old, new) for every leaf that differs; equal digests stop the walk."""
+    if a is not None and b is not None and a[0] == b[0]:
+        return []
+    if a is not None and b is not None and isinstance(a[1], dict) and isinstance(b[1], dict):
+        out = []
+        for k in list(a[1]) + [k for k in b[1] if k not in a[1]]:
+            out.extend(diff_trees(a[1].get(k), b[1].get(k), path + (k,)))
+        return out
+    # leaf changed, or a section appeared / vanished / changed shape: compare its leaves
+    olds, news = {}, {}
+    if a is not None: _leaves(a, path, olds)
+    if b is not None: _leaves(b, path, news)
+    return [(p, olds.get(p), news.get(p)) for p in {**olds, **news} if olds.get(p) != news.get(p)]
+
+def freebie_cost(path:tuple, old, new, edition:Edition) -> int:
+    """Freebie points a change costs (negative = refunded); 0 outside
+    ``freebies`` and the Merits & Flaws picks."""
+    if path == ("builder", "merits"):
+        if not isinstance(old or [], list) or not isinstance(new or [], list):
+            return 0
+        return merits.balance(old or [], edition.flaw_cap) - merits.balance(new or [], edition.flaw_cap)
+    if len(path) < 2 or path[0] != "freebies" or path[1] not in FREEBIE_KIND:
+        return 0
+    if not isinstance(old or 0, int) or not isinstance(new or 0, int):
+        return 0
+    return ((new or 0) - (old or 0)) * edition.costs[FREEBIE_KIND[path[1]]]
+
+def describe(changes:list, edition:Edition) -> List[dict]:
+    return [{"path": "/".join(p), "old": o, "new": n, "cost": freebie_cost(p, o, n, edition)} for p, o, n in changes]
+
+# ======================
+# QUEUE
+# ======================
+
+class ReviewQueue:
+    def __init__(self, path:str=DEFAULT_PATH, tree_cache:int=1024):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._trees: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (tree, edition, problems)
+        self._tree_cache = tree_cache
+        self._tree_lock = threading.Lock()
+
+    def submit(self, char_id:str, data:dict, player:str="") -> dict:
+        payload = json.dumps({"builder": data["builder"], "freebies": data["freebies"]}, separators=(",", ":"))
+        entry = self._read(json.loads(payload))
+        with self._lock:
+            c = self._conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                rev = c.execute("SELECT COALESCE(MAX(revision), 0) + 1 FROM submissions WHERE char_id=?", (char_id,)).fetchone()[0]
+                sub_id = c.execute(
+                    "INSERT INTO submissions(char_id, revision, player, payload, digest, submitted) VALUES(?,?,?,?,?,?)",
+                    (char_id, rev, player, payload, entry[0][0].hex(), time.time()),
+                ).lastrowid
+                # a newer revision supersedes whatever was still waiting
+                c.execute("UPDATE submissions SET status='superseded' WHERE char_id=? AND status='pending' AND id<>?", (char_id, sub_id))
+                c.execute("COMMIT")
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+        self._remember(sub_id, entry)
+        return {"id": sub_id, "char_id": char_id, "revision": rev}
+
+    def pending(self, limit:int=200, offset:int=0) -> List[dict]:
+        """Oldest first; page with ``offset`` and ``pending_count``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, char_id, revision, player, submitted FROM submissions WHERE status='pending' "
+                "ORDER BY submitted, id LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [{"id": r[0], "char_id": r[1], "revision": r[2], "player": r[3], "submitted": r[4]} for r in rows]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM submissions WHERE status='pending'").fetchone()[0]
+
+    def payload(self, sub_id:int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM submissions WHERE id=?", (sub_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _read(data:dict) -> tuple:
+        """(hash tree, edition, problems) of a submitted document; a revision
+        never changes, so this is worked out once and cached with the tree."""
+        try:  # priced and checked under the edition the revision was built in
+            edition = edition_of(data["builder"])
+            problems = check_character(data["builder"], data["freebies"])
+        except (KeyError, TypeError, ValueError) as e:
+            edition, problems = edition_of({}), [f"sheet can't be read: {e}"]
+        return hash_tree(data), edition, problems
+
+    def _remember(self, sub_id:int, entry:tuple):
+        with self._tree_lock:
+            self._trees[sub_id] = entry
+            self._trees.move_to_end(sub_id)
+            if len(self._trees) > self._tree_cache:
+                self._trees.popitem(last=False)
+
+    def _entry(self, sub_id:int) -> Optional[tuple]:
+        with self._tree_lock:
+            e = self._trees.get(sub_id)
+        if e is None:
+            data = self.payload(sub_id)
+            if data is None:
+                return None
+            e = self._read(data)
+            self._remember(sub_id, e)
+        return e
+
+    def tree(self, sub_id:int) -> Optional[tuple]:
+        e = self._entry(sub_id)
+        return e[0] if e else None
+
+    def base_of(self, sub_id:int) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s2.id FROM submissions s1 JOIN submissions s2 ON s2.char_id=s1.char_id AND s2.revision<s1.revision "
+                "WHERE s1.id=? ORDER BY (s2.status='approved') DESC, s2.revision DESC LIMIT 1", (sub_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def diff(self, sub_id:int) -> dict:
+        base = self.base_of(sub_id)
+        new, edition, problems = self._entry(sub_id) or (None, edition_of({}), ["no such submission"])
+        changes = describe(diff_trees(self.tree(base) if base else None, new), edition)
+        return {"id": sub_id, "base": base, "edition": edition.key, "changes": changes,
+                "freebieDelta": sum(ch["cost"] for ch in changes), "problems": list(problems)}
+
+    def decide(self, sub_id:int, approve:bool, comment:str="") -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE submissions SET status=?, reviewed=?, comment=? WHERE id=? AND status='pending'",
+                ("approved" if approve else "rejected", time.time(), comment, sub_id),
+            )
+        return cur.rowcount > 0
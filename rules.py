@@ -0,0 +1,650 @@
+"""Rules core for the V20 builder: game data, derived stats and dice.
+
+Kept free of Streamlit so the UI, the JSON API and the command-line tools
+all compute totals the same way.
+"""
+import copy
+import json
+import os
+import random
+from typing import Dict, List, Literal, Tuple
+
+import merits
+
+# ======================
+# DATA
+# ======================
+
+AttributeGroup = Literal["physical", "social", "mental"]
+AbilityCategory = Literal["talents", "skills", "knowledges"]
+
+NATURES: List[str] = [
+    "Architect","Autocrat","Bon Vivant","Bravo","Caretaker","Celebrant","Competitor","Conformist","Conniver",
+    "Curmudgeon","Defender","Director","Eye of the Storm","Fanatic","Gallant","Gambler","Jester","Judge",
+    "Loner","Martyr","Masochist","Monster","Penitent","Perfectionist","Rebel","Rogue","Scientist","Survivor",
+    "Thrill-Seeker","Traditionalist","Trickster","Visionary"
+]
+
+CLANS = [
+    {"name":"Brujah", "disciplines":["Celerity","Potence","Presence"]},
+    {"name":"Gangrel","disciplines":["Animalism","Fortitude","Protean"]},
+    {"name":"Malkavian","disciplines":["Auspex","Dementation","Obfuscate"]},
+    {"name":"Nosferatu","disciplines":["Animalism","Obfuscate","Potence"]},
+    {"name":"Toreador","disciplines":["Auspex","Celerity","Presence"]},
+    {"name":"Tremere","disciplines":["Auspex","Dominate","Thaumaturgy"]},
+    {"name":"Ventrue","disciplines":["Dominate","Fortitude","Presence"]},
+    {"name":"Assamite","disciplines":["Celerity","Obfuscate","Quietus"]},
+    {"name":"Giovanni","disciplines":["Dominate","Fortitude","Necromancy"]},
+    {"name":"Lasombra","disciplines":["Dominate","Obtenebration","Potence"]},
+    {"name":"Tzimisce","disciplines":["Animalism","Auspex","Vicissitude"]},
+]
+CLAN_TO_DISC = {c["name"]: c["disciplines"] for c in CLANS}
+
+ATTR_GROUPS = [
+    ("physical", "Physical", ["Strength","Dexterity","Stamina"]),
+    ("social",   "Social",   ["Charisma","Manipulation","Appearance"]),
+    ("mental",   "Mental",   ["Perception","Intelligence","Wits"]),
+]
+
+# NOTE: “Dodge” renamed to “Awarness” exactly as requested
+ABILITIES: Dict[AbilityCategory, List[str]] = {
+    "talents":    ["Alertness","Athletics","Brawl","Awarness","Empathy","Expression","Intimidation","Leadership","Streetwise","Subterfuge"],
+    "skills":     ["Animal Ken","Crafts","Drive","Etiquette","Firearms","Larceny","Melee","Performance","Stealth","Survival"],
+    "knowledges": ["Academics","Computer","Finance","Investigation","Law","Linguistics","Medicine","Occult","Politics","Science"],
+}
+
+BACKGROUNDS = ["Allies","Contacts","Fame","Generation","Herd","Influence","Mentor","Resources","Retainers","Status"]
+
+GENERATION_TABLE = [
+    {"gen":13, "traitMax":5, "bloodPerTurn":1, "bloodPool":10},
+    {"gen":12, "traitMax":5, "bloodPerTurn":1, "bloodPool":11},
+    {"gen":11, "traitMax":5, "bloodPerTurn":1, "bloodPool":12},
+    {"gen":10, "traitMax":5, "bloodPerTurn":1, "bloodPool":13},
+    {"gen":9,  "traitMax":5, "bloodPerTurn":1, "bloodPool":14},
+    {"gen":8,  "traitMax":5, "bloodPerTurn":3, "bloodPool":15},
+    {"gen":7,  "traitMax":6, "bloodPerTurn":4, "bloodPool":20},
+    {"gen":6,  "traitMax":7, "bloodPerTurn":6, "bloodPool":30},
+    {"gen":5,  "traitMax":8, "bloodPerTurn":8, "bloodPool":40},
+]
+
+# Discipline power blurbs (compact, V20-flavored; effects summarized)
+DISCIPLINE_POWERS: Dict[str, Dict[int, Dict[str, str]]] = {
+    "Protean": {
+        1: {"name":"Eyes of the Beast", "info":"Eyes glow red; see in total darkness. Cost/roll: none. Effect: night vision, intimidating gaze."},
+        2: {"name":"Feral Claws", "info":"Spend 1 Blood. Grow claws; Str +1 aggravated damage; retract at will."},
+        3: {"name":"Earth Meld", "info":"Roll Stamina+Survival diff 6; 1 turn to sink. Effect: meld with natural earth/stone to hide/sleep."},
+        4: {"name":"Shape of the Beast", "info":"Assume wolf/bat form (depends ST); boosts and movement per form."},
+        5: {"name":"Mist Form", "info":"Become living mist; immune to physical harm; move through cracks."},
+    },
+    "Celerity": {
+        1: {"name":"Quickness", "info":"Spend 1 Blood per extra action this turn. Effect: act faster; move blindingly."},
+        2: {"name":"Alacrity", "info":"As above; improved speed and reaction."},
+        3: {"name":"Rapidity", "info":"As above; multiple extra actions possible (ST adjudicates)."},
+        4: {"name":"Fleetness", "info":"Supernatural speed; near-blur."},
+        5: {"name":"Blinding Speed", "info":"Near-untouchable speed for a scene (with Blood)."},
+    },
+    "Potence": {
+        1: {"name":"Prowess", "info":"Melee/Str damage boosted; spend Blood for auto successes (per dot)."},
+        2: {"name":"Might", "info":"Feats of strength become trivial."},
+        3: {"name":"Vigor", "info":"Devastating blows; break stone/steel with effort."},
+        4: {"name":"Intensity", "info":"Crushing power; leap/throw far."},
+        5: {"name":"Heroic Strength", "info":"Legendary force; shatter barriers."},
+    },
+    "Presence": {
+        1: {"name":"Awe", "info":"Captivates those nearby; no roll vs mortals typically; social edge."},
+        2: {"name":"Dread Gaze", "info":"Instill fear; many mortals flee; roll Cha+Intimidation."},
+        3: {"name":"Entrancement", "info":"Target adores you; extended influence."},
+        4: {"name":"Summon", "info":"Call a known target from afar; they feel compelled to come."},
+        5: {"name":"Majesty", "info":"Become regal/untouchable; few dare oppose you."},
+    },
+    "Animalism": {
+        1: {"name":"Feral Whispers", "info":"Speak with animals; simple commands."},
+        2: {"name":"Beckoning", "info":"Call animals of a region; they come if able."},
+        3: {"name":"Quell the Beast", "info":"Soothe or rouse Beast in mortals/vampires; resist frenzy."},
+        4: {"name":"Subsume the Spirit", "info":"Possess an animal; control senses/body."},
+        5: {"name":"Drawing Out the Beast", "info":"Shift frenzy to another or externalize it."},
+    },
+    "Fortitude": {
+        1: {"name":"Endurance", "info":"Extra soak; resist harm beyond mortal limits."},
+        2: {"name":"Mettle", "info":"Soak lethal; sometimes aggravated (ST)."},
+        3: {"name":"Resilience", "info":"Stand against fire/sunlight longer (not immunity)."},
+        4: {"name":"Resolve", "info":"Ignore crippling wounds briefly."},
+        5: {"name":"Unbreakable", "info":"Near-impossible to put down."},
+    },
+    "Auspex": {
+        1: {"name":"Heightened Senses", "info":"Sharpen all senses; risk sensory overload."},
+        2: {"name":"Aura Perception", "info":"Read emotions/creature type via auras."},
+        3: {"name":"Telepathy", "info":"Read/speak mind-to-mind; resisted by Willpower."},
+        4: {"name":"Psychic Projection", "info":"Astral projection; travel as spirit; body inert."},
+        5: {"name":"Spirit's Touch", "info":"Psychometry: read emotional impressions from objects."},
+    },
+    "Dementation": {
+        1: {"name":"Passion", "info":"Amplify or dampen emotions."},
+        2: {"name":"The Haunting", "info":"Subject experiences unsettling phenomena."},
+        3: {"name":"Eyes of Chaos", "info":"Perceive patterns in madness; hidden truths."},
+        4: {"name":"Voice of Madness", "info":"Brief contagious hysteria/panic."},
+        5: {"name":"Total Insanity", "info":"Crush a mind under madness."},
+    },
+    "Obfuscate": {
+        1: {"name":"Cloak of Shadows", "info":"Remain unseen if still and in cover."},
+        2: {"name":"Unseen Presence", "info":"Move while unseen; avoid drawing attention."},
+        3: {"name":"Mask of a Thousand Faces", "info":"Appear as someone else; casual scrutiny fails."},
+        4: {"name":"Vanish from the Mind's Eye", "info":"Disappear even in plain sight briefly."},
+        5: {"name":"Cloak the Gathering", "info":"Extend obfuscation to companions."},
+    },
+    "Dominate": {
+        1: {"name":"Command", "info":"Single-word orders; eye contact; mortals easy."},
+        2: {"name":"Mesmerize", "info":"Implant suggestions; longer-term commands."},
+        3: {"name":"The Forgetful Mind", "info":"Alter/erase memories."},
+        4: {"name":"Conditioning", "info":"Long-term mental control over a subject."},
+        5: {"name":"Possession", "info":"Wear a mortal like a suit; control their body."},
+    },
+    "Thaumaturgy": {
+        1: {"name":"Blood Magic (Paths/Rituals)", "info":"Access level 1 of chosen Path; rituals by dots (ST approval)."},
+        2: {"name":"Path ••", "info":"Use level 2 effects in chosen Path(s)."},
+        3: {"name":"Path •••", "info":"Use level 3 effects."},
+        4: {"name":"Path ••••", "info":"Use level 4 effects."},
+        5: {"name":"Path •••••", "info":"Use level 5 effects; powerful rituals."},
+    },
+    "Necromancy": {
+        1: {"name":"Death Magic (Paths/Rituals)", "info":"Access level 1 of Necromancy Path; rituals as learned."},
+        2: {"name":"Path ••", "info":"Level 2 effects."},
+        3: {"name":"Path •••", "info":"Level 3 effects."},
+        4: {"name":"Path ••••", "info":"Level 4 effects."},
+        5: {"name":"Path •••••", "info":"Level 5 effects; potent rites."},
+    },
+    "Obtenebration": {
+        1: {"name":"Shadow Play", "info":"Manipulate shadows; dim light."},
+        2: {"name":"Shroud of Night", "info":"Summon oily darkness that hinders foes."},
+        3: {"name":"Arms of the Abyss", "info":"Shadow-tentacles restrain/attack."},
+        4: {"name":"Black Metamorphosis", "info":"Cloak self in living darkness; lethal to touch."},
+        5: {"name":"Tenebrous Form", "info":"Become shadowstuff; pass through cracks."},
+    },
+    "Quietus": {
+        1: {"name":"Silence of Death", "info":"Create zone of absolute silence."},
+        2: {"name":"Scorpion's Touch", "info":"Envenomate blood/weapon; inflict penalties."},
+        3: {"name":"Dagon's Call", "info":"Command victim’s blood to surge painfully."},
+        4: {"name":"Baal's Caress", "info":"Coat weapon with deadly ichor."},
+        5: {"name":"Blood of Acid", "info":"Your blood becomes corrosive."},
+    },
+    "Vicissitude": {
+        1: {"name":"Malleable Visage", "info":"Reshape your face/flesh."},
+        2: {"name":"Fleshcraft", "info":"Reshape flesh of others (willing or subdued)."},
+        3: {"name":"Bonecraft", "info":"Reshape bone; change structure."},
+        4: {"name":"Horrid Form", "info":"Monstrous battle-form with bonuses."},
+        5: {"name":"Bloodform", "info":"Liquefy into blood; seep through cracks."},
+    },
+}
+
+VIRTUES = ["Conscience","SelfControl","Courage"]
+
+# ======================
+# EDITIONS (declarative rule sets in rulesets/*.json)
+# ======================
+
+RULESETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rulesets")
+DEFAULT_EDITION = os.environ.get("V20_EDITION", "v20")
+KINDS = ("attribute","ability","discipline","background","virtue","humanity","willpower")
+SLOTS = ("primary","secondary","tertiary")
+
+def _merge(base:dict, over:dict) -> dict:
+    out = dict(base)
+    for k, v in over.items():
+        out[k] = _merge(out[k], v) if isinstance(v, dict) and isinstance(out.get(k), dict) else v
+    return out
+
+def load_rulesets(path:str=RULESETS_DIR) -> Dict[str, dict]:
+    """Every ``<key>.json`` under ``path``, with ``"extends": "<key>"`` merged in."""
+    raw = {}
+    for fn in sorted(os.listdir(path)):
+        if fn.endswith(".json"):
+            with open(os.path.join(path, fn), encoding="utf-8") as fh:
+                raw[fn[:-5]] = json.load(fh)
+    def resolve(key:str, seen:tuple=()) -> dict:
+        if key in seen:
+            raise ValueError(f"ruleset {key!r} extends itself")
+        spec = raw[key]
+        parent = spec.get("extends")
+        if parent is None:
+            return spec
+        if parent not in raw:
+            raise ValueError(f"ruleset {key!r} extends unknown ruleset {parent!r}")
+        return _merge(resolve(parent, seen + (key,)), {k: v for k, v in spec.items() if k != "extends"})
+    return {key: resolve(key) for key in raw}
+
+class Edition:
+    """A rule set compiled for lookups and validation.
+
+    The spec is read once: budgets, caps and costs become plain dicts (caps
+    are tabulated for every trait max in ``GENERATION_TABLE``), and ``check``
+    runs a flat list of closures with the numbers already bound, so the UI,
+    the API and the review queue validate at the same speed in any edition.
+    """
+
+    def __init__(self, key:str, spec:dict):
+        t = spec.get("traits", {})
+        missing = [k for k in KINDS if k not in t]
+        if "freebies" not in spec: missing.append("freebies")
+        if "flawCap" not in spec.get("merits", {}): missing.append("merits.flawCap")
+        if missing:
+            raise ValueError(f"ruleset {key!r} has no rules for {', '.join(missing)}")
+        self.key, self.name = key, spec.get("name", key)
+        self.description = spec.get("description", "")
+        self.freebies = int(spec["freebies"])
+        self.flaw_cap = int(spec["merits"]["flawCap"])  # most freebies Flaws can add
+        self.costs = {k: int(t[k]["cost"]) for k in KINDS}
+        self.base = {k: int(t[k].get("base", 0)) for k in KINDS}
+        self.budgets: Dict[str, object] = {}
+        for k in ("attribute", "ability"):  # per priority slot; a single number applies to all three
+            b = t[k]["budget"]
+            self.budgets[k] = {s: int(b[s]) for s in SLOTS} if isinstance(b, dict) else {s: int(b) for s in SLOTS}
+        for k in ("discipline", "background", "virtue"):
+            self.budgets[k] = int(t[k]["budget"])
+        self.maxima = {k: t[k]["max"] if t[k]["max"] == "generation" else int(t[k]["max"]) for k in KINDS}
+        self._max = {k: None if m == "generation" else m for k, m in self.maxima.items()}
+        self.caps = {tm: {k: self.cap(k, tm) for k in KINDS} for tm in {g["traitMax"] for g in GENERATION_TABLE}}
+        self._checks = self._compile()
+
+    def budget(self, kind:str, slot:str=None) -> int:
+        b = self.budgets[kind]
+        return b[slot] if isinstance(b, dict) else b
+
+    def cap(self, kind:str, trait_max:int) -> int:
+        m = self._max[kind]
+        return trait_max if m is None else m
+
+    def caps_for(self, trait_max:int) -> Dict[str, int]:
+        return self.caps.get(trait_max) or {k: self.cap(k, trait_max) for k in KINDS}
+
+    def spent(self, F:dict) -> int:
+        c = self.costs
+        spent = sum(v for g in F["attributes"].values() for v in g.values()) * c["attribute"]
+        spent += sum(v for cat in F["abilities"].values() for v in cat.values()) * c["ability"]
+        spent += sum(F["disciplines"].values()) * c["discipline"]
+        spent += sum(F["backgrounds"].values()) * c["background"]
+        spent += sum(F["virtues"].values()) * c["virtue"]
+        return spent + F["humanity"] * c["humanity"] + F["willpower"] * c["willpower"]
+
+    def total(self, B:dict, F:dict) -> int:
+        """Freebies the character has in all: the edition's, Storyteller grants
+        (``F["bonus"]``) and whatever Flaws add beyond the Merits bought."""
+        return self.freebies + F.get("bonus", 0) + merits.balance(B.get("merits", ()), self.flaw_cap)
+
+    def cost_text(self) -> str:
+        return " · ".join(f"{k.capitalize()}:{v}" for k, v in self.costs.items())
+
+    # ---- validation ----
+
+    def _compile(self) -> list:
+        """One closure per constraint: ``fn(B, F, caps, out)`` appends problems to ``out``."""
+        checks = []
+        abud, abase = self.budgets["attribute"], self.base["attribute"]
+        for g, label, stats in ATTR_GROUPS:
+            def attr_budget(B, F, caps, out, g=g, label=label, stats=tuple(stats)):
+                vals = B["attributes"][g]
+                budget = abud[slot_of(B["attributes"]["priorities"], g)]
+                spent = sum(vals[s] - abase for s in stats)
+                if spent > budget:
+                    out.append(f"{label} Attributes: {spent} dots assigned, budget is {budget}")
+                out.extend(f"{s}: below the starting {abase}" for s in stats if vals[s] < abase)
+            checks.append(attr_budget)
+        bbud = self.budgets["ability"]
+        for cat, names in ABILITIES.items():
+            def abil_budget(B, F, caps, out, cat=cat, names=tuple(names)):
+                vals = B["abilities"][cat]
+                budget = bbud[slot_of(B["abilities"]["priorities"], cat)]
+                spent = sum(vals[n] for n in names)
+                if spent > budget:
+                    out.append(f"{cat.capitalize()}: {spent} dots assigned, budget is {budget}")
+            checks.append(abil_budget)
+        for kind, section in (("discipline", "disciplines"), ("background", "backgrounds")):
+            def flat_budget(B, F, caps, out, label=section.capitalize(), section=section, budget=self.budgets[kind]):
+                spent = sum(B[section].values())
+                if spent > budget:
+                    out.append(f"{label}: {spent} dots assigned, budget is {budget}")
+            checks.append(flat_budget)
+        vbud, vbase = self.budgets["virtue"], self.base["virtue"]
+        def virtue_budget(B, F, caps, out):
+            spent = sum(B["virtues"][vt] - vbase for vt in VIRTUES)
+            if spent > vbud:
+                out.append(f"Virtues: {spent} dots added, budget is {vbud}")
+            out.extend(f"{vt}: below the starting {vbase}" for vt in VIRTUES if B["virtues"][vt] < vbase)
+        checks.append(virtue_budget)
+
+        def over(out, trait, base, add, cap):
+            if add < 0:
+                out.append(f"{trait}: freebies can't be negative")
+            elif base + add > cap:
+                out.append(f"{trait}: {base + add} is above the maximum of {cap}")
+        def trait_caps(B, F, caps, out):
+            for g,_,stats in ATTR_GROUPS:
+                bg, fg = B["attributes"][g], F["attributes"][g]
+                for s in stats: over(out, s, bg[s], fg[s], caps["attribute"])
+            for cat, names in ABILITIES.items():
+                bc, fc = B["abilities"][cat], F["abilities"][cat]
+                for n in names: over(out, n, bc[n], fc[n], caps["ability"])
+            for kind, section in (("discipline", "disciplines"), ("background", "backgrounds")):
+                b, f = B[section], F[section]
+                for name in set(b) | set(f): over(out, name, b.get(name, 0), f.get(name, 0), caps[kind])
+            for vt in VIRTUES: over(out, vt, B["virtues"][vt], F["virtues"][vt], caps["virtue"])
+        checks.append(trait_caps)
+        def clan_disciplines(B, F, caps, out):
+            allowed = CLAN_TO_DISC.get(B["concept"]["clan"], ())
+            for d in sorted({d for d, v in B["disciplines"].items() if v} | {d for d, v in F["disciplines"].items() if v}):
+                if d not in allowed:
+                    out.append(f"{d}: not a discipline of this clan")
+        checks.append(clan_disciplines)
+        def derived_caps(B, F, caps, out):
+            # dots bought past the maximum are wasted; a virtue-derived total at the cap is fine
+            v = {vt: B["virtues"][vt] + F["virtues"][vt] for vt in VIRTUES}
+            hum = v["Conscience"] + v["SelfControl"] + F["humanity"]
+            if F["humanity"] > 0 and hum > caps["humanity"]:
+                out.append(f"Humanity: {hum} is above the maximum of {caps['humanity']}")
+            wp = v["Courage"] + F["willpower"]
+            if F["willpower"] > 0 and wp > caps["willpower"]:
+                out.append(f"Willpower: {wp} is above the maximum of {caps['willpower']}")
+        checks.append(derived_caps)
+        def merit_picks(B, F, caps, out):
+            out.extend(merits.explain(B, F))
+        checks.append(merit_picks)
+        def pool(B, F, caps, out, total=self.total, spent=self.spent):
+            s, total = spent(F), total(B, F)
+            if s > total:
+                out.append(f"Freebies: {s} spent of {total}")
+            elif F["pool"] != total - s:
+                out.append(f"Freebies: pool shows {F['pool']} left, but {total} available - {s} spent = {total - s}")
+        checks.append(pool)
+        return checks
+
+    def check(self, B:dict, F:dict) -> List[str]:
+        """Every rule the character breaks in this edition; empty when legal.
+        Unspent dots are not problems, so a sheet in progress checks clean."""
+        caps = self.caps_for(gen_info(B["concept"]["generation"])["traitMax"])
+        out: List[str] = []
+        for fn in self._checks:
+            fn(B, F, caps, out)
+        return out
+
+EDITIONS: Dict[str, Edition] = {k: Edition(k, spec) for k, spec in load_rulesets().items()}
+if DEFAULT_EDITION not in EDITIONS:
+    raise ValueError(f"V20_EDITION={DEFAULT_EDITION!r} matches no ruleset in {RULESETS_DIR}")
+
+def edition_of(B:dict) -> Edition:
+    key = B.get("edition") or DEFAULT_EDITION
+    if key not in EDITIONS:
+        raise ValueError(f"unknown edition {key!r} (known: {', '.join(EDITIONS)})")
+    return EDITIONS[key]
+
+def check_character(B:dict, F:dict) -> List[str]:
+    return edition_of(B).check(B, F)
+
+# ======================
+# STATE
+# ======================
+
+def new_builder(edition:str=DEFAULT_EDITION) -> dict:
+    a, v = EDITIONS[edition].base["attribute"], EDITIONS[edition].base["virtue"]
+    return {
+        "edition": edition,
+        "concept": {
+            "name":"", "player":"", "chronicle":"", "concept":"", "clan":"", "sire":"",
+            "nature":"", "demeanor":"", "generation":13
+        },
+        "attributes": {
+            "physical":{"Strength":a,"Dexterity":a,"Stamina":a},
+            "social":{"Charisma":a,"Manipulation":a,"Appearance":a},
+            "mental":{"Perception":a,"Intelligence":a,"Wits":a},
+            "priorities":{"primary":"physical","secondary":"social","tertiary":"mental"}
+        },
+        "attr_specialties": {  # Attributes specialties at 4+
+            "Strength":"", "Dexterity":"", "Stamina":"",
+            "Charisma":"", "Manipulation":"", "Appearance":"",
+            "Perception":"", "Intelligence":"", "Wits":""
+        },
+        "abilities": {
+            "talents":    {k:0 for k in ABILITIES["talents"]},
+            "skills":     {k:0 for k in ABILITIES["skills"]},
+            "knowledges": {k:0 for k in ABILITIES["knowledges"]},
+            "priorities": {"primary":"talents","secondary":"skills","tertiary":"knowledges"}
+        },
+        "specialties": {"talents":{}, "skills":{}, "knowledges":{}},  # abilities 4+
+        "disciplines": {},
+        "backgrounds": {},
+        "virtues": {"Conscience":v,"SelfControl":v,"Courage":v},
+        "notes":"",
+        "merits": [],       # picks from merits.CATALOG
+        "meritsFlaws":""    # free-text notes on them
+    }
+
+def new_freebies(edition:str=DEFAULT_EDITION) -> dict:
+    return {
+        "pool": EDITIONS[edition].freebies,
+        "bonus": 0,  # Storyteller grants (or penalties) on top of the edition's freebies
+        "attributes": {
+            "physical":{"Strength":0,"Dexterity":0,"Stamina":0},
+            "social":{"Charisma":0,"Manipulation":0,"Appearance":0},
+            "mental":{"Perception":0,"Intelligence":0,"Wits":0},
+        },
+        "abilities": {
+            "talents":    {k:0 for k in ABILITIES["talents"]},
+            "skills":     {k:0 for k in ABILITIES["skills"]},
+            "knowledges": {k:0 for k in ABILITIES["knowledges"]},
+        },
+        "disciplines": {},
+        "backgrounds": {k:0 for k in BACKGROUNDS},
+        "virtues": {"Conscience":0,"SelfControl":0,"Courage":0},
+        "humanity": 0,
+        "willpower": 0,
+    }
+
+def switch_edition(B:dict, F:dict, key:str):
+    """Move a character to another rule set in place. Attribute and Virtue dots
+    shift with the new starting values (dots assigned above them are kept) and
+    the pool is recomputed from the new freebies, flaw cap and costs."""
+    old, new = edition_of(B), EDITIONS[key]
+    da, dv = new.base["attribute"] - old.base["attribute"], new.base["virtue"] - old.base["virtue"]
+    for g,_,stats in ATTR_GROUPS:
+        for s in stats: B["attributes"][g][s] = max(0, B["attributes"][g][s] + da)
+    for vt in VIRTUES: B["virtues"][vt] = max(0, B["virtues"][vt] + dv)
+    B["edition"] = key
+    F["pool"] = new.total(B, F) - new.spent(F)
+
+def gen_info(gen: int) -> dict:
+    return next((g for g in GENERATION_TABLE if g["gen"] == int(gen)), GENERATION_TABLE[0])
+
+# ======================
+# TOTALS (base + freebies)
+# ======================
+
+def caps_of(B:dict) -> Dict[str, int]:
+    """Trait caps for this character's edition and generation."""
+    return edition_of(B).caps_for(gen_info(B["concept"]["generation"])["traitMax"])
+
+def total_value_attribute(B:dict, F:dict, group:str, stat:str, trait_max:int) -> int:
+    return min(edition_of(B).cap("attribute", trait_max), B["attributes"][group][stat] + F["attributes"][group][stat])
+
+def total_value_ability(B:dict, F:dict, cat:str, name:str) -> int:
+    return min(caps_of(B)["ability"], B["abilities"][cat][name] + F["abilities"][cat][name])
+
+def total_value_background(B:dict, F:dict, name:str) -> int:
+    base = B["backgrounds"].get(name, 0)
+    add  = F["backgrounds"].get(name, 0)
+    return min(caps_of(B)["background"], base + add)
+
+def total_value_discipline(B:dict, F:dict, name:str) -> int:
+    base = B["disciplines"].get(name, 0)
+    add  = F["disciplines"].get(name, 0)
+    return min(caps_of(B)["discipline"], base + add)
+
+def total_value_virtue(B:dict, F:dict, name:str) -> int:
+    return min(caps_of(B)["virtue"], B["virtues"][name] + F["virtues"][name])
+
+def total_humanity(B:dict, F:dict) -> int:
+    val = B["virtues"]["Conscience"] + F["virtues"]["Conscience"] + B["virtues"]["SelfControl"] + F["virtues"]["SelfControl"] + F["humanity"]
+    return min(caps_of(B)["humanity"], val)
+
+def total_willpower(B:dict, F:dict) -> int:
+    val = B["virtues"]["Courage"] + F["virtues"]["Courage"] + F["willpower"]
+    return min(caps_of(B)["willpower"], val)
+
+def sheet_totals(B:dict, F:dict) -> dict:
+    """Flat summary of a character: every total plus the generation-derived stats."""
+    GI = gen_info(B["concept"]["generation"])
+    trait_max = GI["traitMax"]
+    disciplines = sorted(set(B["disciplines"]) | set(F["disciplines"]))
+    return {
+        "name": B["concept"]["name"],
+        "edition": edition_of(B).key,
+        "clan": B["concept"]["clan"],
+        "generation": GI["gen"],
+        "attributes": {g: {s: total_value_attribute(B, F, g, s, trait_max) for s in stats} for g,_,stats in ATTR_GROUPS},
+        "abilities": {cat: {n: total_value_ability(B, F, cat, n) for n in names} for cat,names in ABILITIES.items()},
+        "disciplines": {d: total_value_discipline(B, F, d) for d in disciplines if total_value_discipline(B, F, d) > 0},
+        "backgrounds": {bg: total_value_background(B, F, bg) for bg in BACKGROUNDS if total_value_background(B, F, bg) > 0},
+        "virtues": {vt: total_value_virtue(B, F, vt) for vt in VIRTUES},
+        "merits": list(B.get("merits", ())),
+        "humanity": total_humanity(B, F),
+        "willpower": total_willpower(B, F),
+        "traitMax": trait_max,
+        "bloodPool": GI["bloodPool"],
+        "bloodPerTurn": GI["bloodPerTurn"],
+        "freebiesLeft": F["pool"],
+    }
+
+# ======================
+# FEASIBILITY (reachable maximum per trait)
+# ======================
+
+def slot_of(priorities:dict, group:str) -> str:
+    for slot, grp in priorities.items():
+        if grp == group: return slot
+    return "tertiary"
+
+class Feasibility:
+    """Highest value every trait can still reach with the dots and freebies left.
+
+    Built once per rerun from the remaining creation budget of each group and
+    ``pool // cost`` for each freebie category; ``reach`` is then O(1). Each
+    trait is considered on its own: spending on one lowers the others' reach,
+    which the next rebuild picks up.
+    """
+
+    def __init__(self, B:dict, F:dict, trait_max:int):
+        self.B, self.F = B, F
+        self.trait_max = trait_max
+        E = self.edition = edition_of(B)
+        self.caps = E.caps_for(trait_max)
+        ap, bp = B["attributes"]["priorities"], B["abilities"]["priorities"]
+        abase, vbase = E.base["attribute"], E.base["virtue"]
+        self.left = {
+            ("attribute", g): E.budget("attribute", slot_of(ap, g)) - sum(B["attributes"][g][s]-abase for s in stats)
+            for g,_,stats in ATTR_GROUPS
+        }
+        for cat in ABILITIES:
+            self.left[("ability", cat)] = E.budget("ability", slot_of(bp, cat)) - sum(B["abilities"][cat][n] for n in ABILITIES[cat])
+        self.left[("discipline", None)] = E.budget("discipline") - sum(B["disciplines"].values())
+        self.left[("background", None)] = E.budget("background") - sum(B["backgrounds"].values())
+        self.left[("virtue", None)] = E.budget("virtue") - sum(v-vbase for v in B["virtues"].values())
+        # Conscience/Self-Control feed Humanity and Courage feeds Willpower
+        self.left[("humanity", None)] = self.left[("willpower", None)] = self.left[("virtue", None)]
+        self.buyable = {kind: max(0, F["pool"]) // cost for kind, cost in E.costs.items()}
+
+    def cap(self, kind:str) -> int:
+        return self.caps[kind]
+
+    def reach(self, kind:str, group, current:int) -> int:
+        """``current`` is the trait's total (base + freebies)."""
+        creation = max(0, self.left.get((kind, group), 0))
+        return min(self.cap(kind), current + creation + self.buyable[kind])
+
+# ======================
+# BULK FREEBIE EDITS
+# ======================
+
+def freebie_rows(B:dict, F:dict, trait_max:int) -> List[dict]:
+    """One row per freebie-buyable trait, for the grid editor."""
+    rows = []
+    E = edition_of(B)
+    caps = E.caps_for(trait_max)
+    def row(kind, group, trait, base, add):
+        rows.append({"Kind": kind, "Group": group or "", "Trait": trait, "Base": base, "Freebies": add, "Max": caps[kind], "Cost": E.costs[kind]})
+    for g,_,stats in ATTR_GROUPS:
+        for s in stats: row("attribute", g, s, B["attributes"][g][s], F["attributes"][g][s])
+    for cat, names in ABILITIES.items():
+        for n in names: row("ability", cat, n, B["abilities"][cat][n], F["abilities"][cat][n])
+    for d in CLAN_TO_DISC.get(B["concept"]["clan"], []):
+        row("discipline", None, d, B["disciplines"].get(d, 0), F["disciplines"].get(d, 0))
+    for bg in BACKGROUNDS:
+        row("background", None, bg, B["backgrounds"].get(bg, 0), F["backgrounds"].get(bg, 0))
+    for vt in VIRTUES:
+        row("virtue", None, vt, B["virtues"][vt], F["virtues"][vt])
+    row("humanity", None, "Humanity", B["virtues"]["Conscience"] + B["virtues"]["SelfControl"], F["humanity"])
+    row("willpower", None, "Willpower", B["virtues"]["Courage"], F["willpower"])
+    return rows
+
+def apply_freebie_batch(B:dict, F:dict, rows:List[dict], trait_max:int) -> Tuple[dict, List[str]]:
+    """Apply edited ``freebie_rows`` as one transaction.
+
+    Returns the new freebies dict and an empty list, or the untouched ``F``
+    and every problem found; nothing is applied unless all rows pass.
+    """
+    new, errors = copy.deepcopy(F), []
+    E = edition_of(B)
+    caps = E.caps_for(trait_max)
+    allowed = set(CLAN_TO_DISC.get(B["concept"]["clan"], []))
+    for r in rows:
+        kind, group, trait = r["Kind"], r["Group"] or None, r["Trait"]
+        try:
+            add = int(r["Freebies"])
+        except (TypeError, ValueError):
+            errors.append(f"{trait}: freebies must be a whole number"); continue
+        if add < 0:
+            errors.append(f"{trait}: freebies can't be negative"); continue
+        if kind == "attribute":
+            base, cap = B["attributes"][group][trait], caps["attribute"]
+            new["attributes"][group][trait] = add
+        elif kind == "ability":
+            base, cap = B["abilities"][group][trait], caps["ability"]
+            new["abilities"][group][trait] = add
+        elif kind == "discipline":
+            if trait not in allowed:
+                errors.append(f"{trait}: not a discipline of this clan"); continue
+            base, cap = B["disciplines"].get(trait, 0), caps["discipline"]
+            new["disciplines"][trait] = add
+        elif kind == "background":
+            base, cap = B["backgrounds"].get(trait, 0), caps["background"]
+            new["backgrounds"][trait] = add
+        elif kind == "virtue":
+            base, cap = B["virtues"][trait], caps["virtue"]
+            new["virtues"][trait] = add
+        elif kind in ("humanity", "willpower"):
+            new[kind] = add
+            continue  # capped below, once the virtues in this batch are known
+        else:
+            errors.append(f"{trait}: unknown trait kind {kind!r}"); continue
+        if base + add > cap:
+            errors.append(f"{trait}: {base} + {add} is above the maximum of {cap}")
+    raw_hum = B["virtues"]["Conscience"] + new["virtues"]["Conscience"] + B["virtues"]["SelfControl"] + new["virtues"]["SelfControl"] + new["humanity"]
+    if new["humanity"] > F["humanity"] and raw_hum > caps["humanity"]:
+        errors.append(f"Humanity: {raw_hum} is above the maximum of {caps['humanity']}")
+    raw_wp = B["virtues"]["Courage"] + new["virtues"]["Courage"] + new["willpower"]
+    if new["willpower"] > F["willpower"] and raw_wp > caps["willpower"]:
+        errors.append(f"Willpower: {raw_wp} is above the maximum of {caps['willpower']}")
+
+    cost = E.spent(new) - E.spent(F)
+    if cost > F["pool"]:
+        errors.append(f"these edits cost {cost} freebies but only {F['pool']} are left")
+    if errors:
+        return F, errors
+    new["pool"] = F["pool"] - cost
+    return new, []
+
+# ======================
+# DICE
+# ======================
+
+def roll_d10(pool:int, diff:int, rng:random.Random=random) -> dict:
+    rolls = [int(rng.random() * 10) + 1 for _ in range(int(pool))]
+    successes = sum(1 for r in rolls if r >= diff and r != 1)
+    ones = rolls.count(1)
+    return {"rolls": rolls, "successes": successes, "ones": ones, "net": successes - ones}
@@ -0,0 +1,392 @@
+"""Compact per-session character state with memory accounting and idle eviction.
+
+Between reruns a session's builder and freebies are not kept as nested dicts
+but packed into a fixed layout:
+
+* every dot value goes into one ``array('h')`` at a position fixed by
+  ``INT_LAYOUT`` (-1 marks a key that is absent, e.g. an unbought discipline);
+* every text field goes into a tuple at a position fixed by ``TEXT_LAYOUT``,
+  with strings interned so repeated clans, natures and empty fields share one
+  object across all sessions;
+* lists of names (Merits & Flaws picks) go after the text fields as one
+  interned string each, so the common selections are shared too;
+* anything the layout doesn't know (imported oddities) rides along in
+  ``extra`` unchanged, so packing never loses data.
+
+Two interchangeable backends hold the sessions (``V20_SESSION_BACKEND``):
+
+* ``memory`` (``SessionRegistry``) keeps the packed records of this process,
+  reports their size and moves sessions idle for longer than
+  ``idle_seconds`` to the ``sessions`` table of the SQLite store;
+* ``sqlite`` (``SQLiteSessions``) keeps nothing in the process, so several app
+  processes behind a load balancer can serve the same session and any of them
+  can pick it up after a crash.
+
+Both version every save; a save based on an outdated load raises
+``StaleSession`` instead of overwriting the newer state.
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from itertools import permutations
+from typing import Dict, List, Optional, Tuple
+
+from rules import ABILITIES, ATTR_GROUPS, BACKGROUNDS, DISCIPLINE_POWERS, SLOTS, VIRTUES, new_builder, new_freebies
+from store import DEFAULT_PATH
+
+IDLE_SECONDS = float(os.environ.get("V20_IDLE_SECONDS", "900"))
+
+# ======================
+# LAYOUT
+# ======================
+
+DISCIPLINES = sorted(DISCIPLINE_POWERS)
+ATTR_PERMS = list(permutations([g for g,_,_ in ATTR_GROUPS]))
+ABIL_PERMS = list(permutations(list(ABILITIES)))
+
+INT_LAYOUT: List[tuple] = [("builder","concept","generation")]
+INT_LAYOUT += [("builder","attributes",g,s) for g,_,stats in ATTR_GROUPS for s in stats]
+INT_LAYOUT += [("builder","abilities",c,n) for c,names in ABILITIES.items() for n in names]
+INT_LAYOUT += [("builder","disciplines",d) for d in DISCIPLINES]
+INT_LAYOUT += [("builder","backgrounds",bg) for bg in BACKGROUNDS]
+INT_LAYOUT += [("builder","virtues",vt) for vt in VIRTUES]
+INT_LAYOUT += [("freebies","pool"), ("freebies","bonus")]
+INT_LAYOUT += [("freebies","attributes",g,s) for g,_,stats in ATTR_GROUPS for s in stats]
+INT_LAYOUT += [("freebies","abilities",c,n) for c,names in ABILITIES.items() for n in names]
+INT_LAYOUT += [("freebies","disciplines",d) for d in DISCIPLINES]
+INT_LAYOUT += [("freebies","backgrounds",bg) for bg in BACKGROUNDS]
+INT_LAYOUT += [("freebies","virtues",vt) for vt in VIRTUES]
+INT_LAYOUT += [("freebies","humanity"), ("freebies","willpower")]
+PRIO_LAYOUT = [("builder","attributes","priorities"), ("builder","abilities","priorities")]
+
+CONCEPT_TEXT = ["name","player","chronicle","concept","clan","sire","nature","demeanor"]
+TEXT_LAYOUT: List[tuple] = [("builder","concept",k) for k in CONCEPT_TEXT]
+TEXT_LAYOUT += [("builder","attr_specialties",s) for _,_,stats in ATTR_GROUPS for s in stats]
+TEXT_LAYOUT += [("builder","specialties",c,n) for c,names in ABILITIES.items() for n in names]
+TEXT_LAYOUT += [("builder","notes"), ("builder","meritsFlaws"), ("builder","edition")]
+LIST_LAYOUT = [("builder","merits")]
+LIST_SEP = "\x1f"
+
+# dicts whose keys are open-ended; keys outside the layout send the whole dict to ``extra``
+OPEN_DICTS = {
+    ("builder","disciplines"): set(DISCIPLINES), ("freebies","disciplines"): set(DISCIPLINES),
+    ("builder","backgrounds"): set(BACKGROUNDS), ("freebies","backgrounds"): set(BACKGROUNDS),
+    **{("builder","specialties",c): set(names) for c,names in ABILITIES.items()},
+}
+KNOWN_TOP = {
+    "builder": {"edition","concept","attributes","attr_specialties","abilities","specialties","disciplines","backgrounds","virtues","notes","merits","meritsFlaws"},
+    "freebies": {"pool","bonus","attributes","abilities","disciplines","backgrounds","virtues","humanity","willpower"},
+}
+
+_MISSING = object()
+
+def _get(doc:dict, path:tuple):
+    for k in path:
+        if not isinstance(doc, dict) or k not in doc:
+            return _MISSING
+        doc = doc[k]
+    return doc
+
+def _set(doc:dict, path:tuple, value):
+    for k in path[:-1]:
+        doc = doc.setdefault(k, {})
+    doc[path[-1]] = value
+
+def _del(doc:dict, path:tuple):
+    parent = _get(doc, path[:-1])
+    if isinstance(parent, dict):
+        parent.pop(path[-1], None)
+
+def _intern(s):
+    return sys.intern(s) if isinstance(s, str) else s
+
+# ======================
+# CODEC
+# ======================
+
+Packed = Tuple[bytes, tuple, Optional[dict]]
+
+def pack(B:dict, F:dict) -> Packed:
+    doc = {"builder": B, "freebies": F}
+    extra: Dict[str, object] = {}
+    dots = array("h", [-1]) * len(INT_LAYOUT)
+    for i, path in enumerate(INT_LAYOUT):
+        v = _get(doc, path)
+        if v is _MISSING:
+            continue
+        if isinstance(v, int) and not isinstance(v, bool) and -1 < v < 32768:
+            dots[i] = v
+        else:
+            extra["/".join(path)] = v
+    for path, perms in zip(PRIO_LAYOUT, (ATTR_PERMS, ABIL_PERMS)):
+        p = _get(doc, path)
+        order = tuple(p.get(s) for s in SLOTS) if isinstance(p, dict) else None
+        if order in perms and len(p) == 3:
+            dots.append(perms.index(order))
+        else:
+            dots.append(-1)
+            extra["/".join(path)] = p
+    text = []
+    for path in TEXT_LAYOUT:
+        v = _get(doc, path)
+        if v is _MISSING:
+            text.append(None)
+        elif isinstance(v, str):
+            text.append(_intern(v))
+        else:
+            text.append(None)
+            extra["/".join(path)] = v
+    for path in LIST_LAYOUT:
+        v = _get(doc, path)
+        if v is _MISSING:
+            text.append(None)
+        elif isinstance(v, list) and all(isinstance(x, str) and x and LIST_SEP not in x for x in v):
+            text.append(_intern(LIST_SEP.join(v)))
+        else:
+            text.append(None)
+            extra["/".join(path)] = v
+    for path, known in OPEN_DICTS.items():
+        d = _get(doc, path)
+        if isinstance(d, dict) and not set(d) <= known:
+            extra["/".join(path)] = d
+    for top, known in KNOWN_TOP.items():
+        for k in set(doc[top]) - known:
+            extra[f"{top}/{k}"] = doc[top][k]
+    return dots.tobytes(), tuple(text), (extra or None)
+
+def unpack(packed:Packed) -> Tuple[dict, dict]:
+    raw, text, extra = packed
+    dots = array("h"); dots.frombytes(raw)
+    B, F = new_builder(), new_freebies()
+    # open dicts start empty; the layout fills in the keys that were present
+    B["disciplines"], B["backgrounds"], F["disciplines"], F["backgrounds"] = {}, {}, {}, {}
+    B["specialties"] = {c: {} for c in ABILITIES}
+    doc = {"builder": B, "freebies": F}
+    for i, path in enumerate(INT_LAYOUT):
+        if dots[i] >= 0:
+            _set(doc, path, dots[i])
+        elif path[1] not in ("disciplines", "backgrounds"):
+            _del(doc, path)
+    for j, (path, perms) in enumerate(zip(PRIO_LAYOUT, (ATTR_PERMS, ABIL_PERMS))):
+        k = dots[len(INT_LAYOUT) + j]
+        if k >= 0:
+            _set(doc, path, dict(zip(SLOTS, perms[k])))
+    for path, v in zip(TEXT_LAYOUT, text):
+        if v is not None:
+            _set(doc, path, v)
+        elif path[1] != "specialties":
+            _del(doc, path)
+    for path, v in zip(LIST_LAYOUT, text[len(TEXT_LAYOUT):]):
+        if v is not None:
+            _set(doc, path, v.split(LIST_SEP) if v else [])
+        else:
+            _del(doc, path)
+    for key, v in (extra or {}).items():
+        _set(doc, tuple(key.split("/")), json.loads(json.dumps(v)))
+    return B, F
+
+def deep_size(obj, seen:Optional[set]=None) -> int:
+    """Bytes held by ``obj`` and everything it references (each object once)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(v, seen) for v in obj)
+    return size
+
+# ======================
+# BACKENDS
+# ======================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id      TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated REAL NOT NULL
+);
+"""
+
+class StaleSession(Exception):
+    """The session was saved elsewhere (another tab or process) after it was loaded."""
+
+class SessionTable:
+    """The ``sessions`` table: JSON documents with a version for compare-and-swap."""
+
+    def __init__(self, path:str=DEFAULT_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        cols = {r[1] for r in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in cols:  # tables written before versions existed
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+    def get(self, sid:str) -> Optional[Tuple[dict, int]]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload, version FROM sessions WHERE id=?", (sid,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, sid:str, B:dict, F:dict, expected:Optional[int]) -> int:
+        """Write if the stored version is still ``expected`` (0 = must not exist yet,
+        None = overwrite unconditionally). Returns the new version."""
+        payload = json.dumps({"builder": B, "freebies": F}, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            if expected is None:
+                row = self._conn.execute(
+                    "INSERT INTO sessions(id, payload, version, updated) VALUES(?,?,1,?) ON CONFLICT(id) DO UPDATE "
+                    "SET payload=excluded.payload, version=sessions.version+1, updated=excluded.updated RETURNING version",
+                    (sid, payload, now)).fetchone()
+            elif expected == 0:
+                row = self._conn.execute(
+                    "INSERT INTO sessions(id, payload, version, updated) VALUES(?,?,1,?) ON CONFLICT(id) DO NOTHING RETURNING version",
+                    (sid, payload, now)).fetchone()
+            else:
+                row = self._conn.execute(
+                    "UPDATE sessions SET payload=?, version=version+1, updated=? WHERE id=? AND version=? RETURNING version",
+                    (payload, now, sid, expected)).fetchone()
+        if row is None:
+            raise StaleSession(sid)
+        return row[0]
+
+    def delete(self, sid:str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id=?", (sid,))
+
+    def rows(self) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute("SELECT id, length(payload), updated FROM sessions").fetchall()
+        return [{"session": r[0], "bytes": r[1], "idle": round(now - r[2])} for r in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+class SessionRegistry:
+    """In-process backend: packed state of every live session of this process;
+    sessions idle past ``idle_seconds`` move to the SQLite table."""
+
+    kind = "memory"
+
+    def __init__(self, path:str=DEFAULT_PATH, idle_seconds:float=IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.table = SessionTable(path)
+        self._lock = threading.Lock()
+        self._live: Dict[str, dict] = {}  # sid -> {"packed", "version", "seen", "bytes"}
+        self._last_sweep = 0.0
+
+    def load(self, sid:str) -> Tuple[dict, dict, int]:
+        with self._lock:
+            entry = self._live.get(sid)
+            if entry is not None:
+                entry["seen"] = time.time()
+                return unpack(entry["packed"]) + (entry["version"],)
+        got = self.table.get(sid)
+        if got is None:
+            return new_builder(), new_freebies(), 0
+        data, version = got
+        self._keep(sid, data["builder"], data["freebies"], version)
+        self.table.delete(sid)
+        return data["builder"], data["freebies"], version
+
+    def _keep(self, sid:str, B:dict, F:dict, version:int):
+        packed = pack(B, F)
+        with self._lock:
+            self._live[sid] = {"packed": packed, "version": version, "seen": time.time(), "bytes": deep_size(packed)}
+
+    def save(self, sid:str, B:dict, F:dict, version:int) -> int:
+        with self._lock:
+            entry = self._live.get(sid)
+            current = entry["version"] if entry else 0
+        if current != version:
+            raise StaleSession(sid)
+        self._keep(sid, B, F, version + 1)
+        return version + 1
+
+    def sweep(self, now:Optional[float]=None, every:float=30.0) -> int:
+        """Evict sessions idle longer than ``idle_seconds``; runs at most every ``every`` seconds."""
+        now = time.time() if now is None else now
+        if now - self._last_sweep < every:
+            return 0
+        self._last_sweep = now
+        return self.evict_idle(now)
+
+    def evict_idle(self, now:Optional[float]=None, idle_seconds:Optional[float]=None) -> int:
+        now = time.time() if now is None else now
+        limit = self.idle_seconds if idle_seconds is None else idle_seconds
+        with self._lock:
+            idle = [(sid, e, e["seen"]) for sid, e in self._live.items() if now - e["seen"] > limit]
+        evicted = 0
+        for sid, e, seen in idle:
+            # write first and drop after, so a load in between still finds the
+            # session in memory; one that was loaded or saved meanwhile stays
+            B, F = unpack(e["packed"])
+            self.table.put(sid, B, F, None)
+            with self._lock:
+                gone = self._live.get(sid) is e and e["seen"] == seen
+                if gone:
+                    del self._live[sid]
+            if gone:
+                evicted += 1
+            else:
+                self.table.delete(sid)  # the live copy is the current one
+        return evicted
+
+    def stats(self) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            return [{"session": sid, "bytes": e["bytes"], "idle": round(now - e["seen"])} for sid, e in self._live.items()]
+
+    def evicted_count(self) -> int:
+        return self.table.count()
+
+class SQLiteSessions:
+    """Shared backend: every load and save goes to the SQLite table, so any app
+    process can serve any session and nothing is lost when one crashes.
+    Saves are compare-and-swap on the version read at load time."""
+
+    kind = "sqlite"
+    idle_seconds = 0.0
+
+    def __init__(self, path:str=DEFAULT_PATH):
+        self.table = SessionTable(path)
+
+    def load(self, sid:str) -> Tuple[dict, dict, int]:
+        got = self.table.get(sid)
+        if got is None:
+            return new_builder(), new_freebies(), 0
+        data, version = got
+        return data["builder"], data["freebies"], version
+
+    def save(self, sid:str, B:dict, F:dict, version:int) -> int:
+        return self.table.put(sid, B, F, version)
+
+    def sweep(self, now:Optional[float]=None, every:float=30.0) -> int:
+        return 0  # nothing is held in memory
+
+    def evict_idle(self, now:Optional[float]=None, idle_seconds:Optional[float]=None) -> int:
+        return 0
+
+    def stats(self) -> List[dict]:
+        return self.table.rows()
+
+    def evicted_count(self) -> int:
+        return 0
+
+BACKENDS = {"memory": SessionRegistry, "sqlite": SQLiteSessions}
+
+def open_backend(kind:Optional[str]=None, path:str=DEFAULT_PATH):
+    kind = kind or os.environ.get("V20_SESSION_BACKEND", "memory")
+    if kind not in BACKENDS:
+        raise ValueError(f"unknown session backend {kind!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[kind](path)
@@ -0,0 +1,95 @@
+"""SQLite character store shared by the Streamlit app and the JSON API.
+
+One row per character holding the exported ``{"builder": ..., "freebies": ...}``
+document. WAL mode lets several processes read while one writes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+DEFAULT_PATH = os.environ.get("V20_STORE", str(Path(__file__).parent / "characters.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    id      TEXT PRIMARY KEY,
+    name    TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated REAL NOT NULL
+);
+"""
+
+class CharacterStore:
+    def __init__(self, path:str=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed_elsewhere(self) -> bool:
+        """True once after another connection (or process) committed a write
+        to this database file, whichever table it touched."""
+        with self._lock:
+            dv = self._read_data_version()
+            if dv != self._data_version:
+                self._data_version = dv
+                return True
+            return False
+
+    def get(self, char_id:str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM characters WHERE id=?", (char_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_stamped(self, char_id:str) -> Optional[Tuple[dict, tuple]]:
+        """The document and its ``stamp``, read together."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload, version, updated FROM characters WHERE id=?", (char_id,)).fetchone()
+        return (json.loads(row[0]), (row[1], row[2])) if row else None
+
+    def stamp(self, char_id:str) -> Optional[tuple]:
+        """(version, updated) of the row. The version restarts at 1 when an id
+        is deleted and stored again; the write time does not repeat."""
+        with self._lock:
+            row = self._conn.execute("SELECT version, updated FROM characters WHERE id=?", (char_id,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get_raw(self, char_id:str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM characters WHERE id=?", (char_id,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, char_id:str, data:dict) -> int:
+        name = data.get("builder", {}).get("concept", {}).get("name", "")
+        payload = json.dumps(data, separators=(",", ":"))
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO characters(id, name, payload, version, updated) VALUES(?,?,?,1,?) "
+                "ON CONFLICT(id) DO UPDATE SET name=excluded.name, payload=excluded.payload, "
+                "version=characters.version+1, updated=excluded.updated RETURNING version",
+                (char_id, name, payload, time.time()),
+            ).fetchone()[0]
+
+    def delete(self, char_id:str) -> bool:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM characters WHERE id=?", (char_id,))
+        return cur.rowcount > 0
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id, name, version, updated FROM characters ORDER BY updated DESC").fetchall()
+        return [{"id": r[0], "name": r[1], "version": r[2], "updated": r[3]} for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()